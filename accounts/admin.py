@@ -2,10 +2,11 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import User, Invoice, InvoiceItem, JournalEntry, JournalEntryLine
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
 from .models import Account
-from .models import AccountingPeriod
-from .services import close_accounting_period
+from .models import AccountingPeriod, BackgroundJob, PostingRule
+from . import periods
+from .jobs import enqueue
+from .services import approve_invoices
 from django.contrib import messages
 
 
@@ -36,8 +37,26 @@ class InvoiceAdmin(admin.ModelAdmin):
     )
     list_filter = ('invoice_type', 'is_approved', 'created_at')
     search_fields = ('invoice_number',)
+    # يُحسب من البنود ولا يُحفظ من النموذج
+    readonly_fields = ('total_amount',)
+    actions = ["approve_selected"]
+
+    def approve_selected(self, request, queryset):
+        try:
+            approved, skipped = approve_invoices(queryset, request.user)
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+            return
+
+        for invoice, reason in skipped:
+            messages.error(request, f"{invoice.invoice_number}: {reason}")
+        if approved:
+            messages.success(request, f"تم اعتماد {len(approved)} فاتورة")
+
+    approve_selected.short_description = "اعتماد الفواتير المحددة"
+
     def save_model(self, request, obj, form, change):
-        if obj.period and obj.period.is_closed:
+        if periods.is_closed(obj.period_id):
             raise ValidationError("لا يمكن حفظ فاتورة في فترة محاسبية مقفلة")
         super().save_model(request, obj, form, change)
 
@@ -59,7 +78,7 @@ class JournalEntryLineInline(admin.TabularInline):
     model = JournalEntryLine
     extra = 2
     def save_model(self, request, obj, form, change):
-        if obj.period and obj.period.is_closed:
+        if periods.is_closed(obj.journal_entry.period_id):
             raise ValidationError("لا يمكن حفظ فاتورة في فترة محاسبية مقفلة")
         super().save_model(request, obj, form, change)
 
@@ -72,32 +91,39 @@ class JournalEntryAdmin(admin.ModelAdmin):
         'date',
         'description',
         'status',
+        'total_debit',
+        'total_credit',
+        'is_balanced',
         'created_by',
-       
-
     )
-    list_filter = ('status', 'date')
+    list_filter = ('status', 'is_balanced', 'date')
     search_fields = ('description',)
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'total_debit', 'total_credit', 'is_balanced')
 
     inlines = [JournalEntryLineInline]
     def save_related(self, request, form, formsets, change):
         super().save_related(request, form, formsets, change)
 
+        # المجاميع حُدّثت مع حفظ الأسطر، فلا حاجة لإعادة جمعها
         entry = form.instance
+        entry.refresh_from_db(fields=['total_debit', 'total_credit', 'is_balanced'])
 
-        total_debit = entry.lines.aggregate(total=Sum('debit'))['total'] or 0
-        total_credit = entry.lines.aggregate(total=Sum('credit'))['total'] or 0
-
-        if total_debit != total_credit:
+        if not entry.is_balanced:
             raise ValidationError(
-                f"❌ القيد غير متوازن: المدين = {total_debit} ، الدائن = {total_credit}"
+                f"❌ القيد غير متوازن: المدين = {entry.total_debit} ، الدائن = {entry.total_credit}"
             )
     def save_model(self, request, obj, form, change):
-        if obj.period and obj.period.is_closed:
+        if periods.is_closed(obj.period_id):
             raise ValidationError("لا يمكن حفظ فاتورة في فترة محاسبية مقفلة")
         super().save_model(request, obj, form, change)
 
+# قواعد الترحيل التلقائي للفواتير
+@admin.register(PostingRule)
+class PostingRuleAdmin(admin.ModelAdmin):
+    list_display = ('invoice_type', 'debit_account', 'credit_account')
+    autocomplete_fields = ('debit_account', 'credit_account')
+
+
 #اسطر القيد
 @admin.register(JournalEntryLine)
 class JournalEntryLineAdmin(admin.ModelAdmin):
@@ -109,7 +135,7 @@ class JournalEntryLineAdmin(admin.ModelAdmin):
     )
     list_filter = ('account',)
     def save_model(self, request, obj, form, change):
-        if obj.period and obj.period.is_closed:
+        if periods.is_closed(obj.journal_entry.period_id):
             raise ValidationError("لا يمكن حفظ فاتورة في فترة محاسبية مقفلة")
         super().save_model(request, obj, form, change)
 
@@ -129,24 +155,25 @@ class AccountAdmin(admin.ModelAdmin):
     search_fields = ('code', 'name')
 
 
-    @admin.register(AccountingPeriod)
-    class AccountingPeriodAdmin(admin.ModelAdmin):
-     list_display = ("name", "start_date", "end_date", "is_closed")
-     actions = ["close_period"]
+@admin.register(AccountingPeriod)
+class AccountingPeriodAdmin(admin.ModelAdmin):
+    list_display = ("name", "start_date", "end_date", "is_closed", "closed_at", "closed_by")
+    actions = ["close_period"]
 
     def close_period(self, request, queryset):
-        for period in queryset:
-            try:
-                close_accounting_period(period)
-                messages.success(
-                    request,
-                    f"تم إقفال الفترة {period.name}"
-                )
-            except ValidationError as e:
-                messages.error(request, str(e))
+        # الإقفال ثقيل، فيُجدول في العمال الخلفيين بترتيب الفترات
+        for period in queryset.filter(is_closed=False).order_by('start_date'):
+            enqueue('close_period', request.user, period_id=period.id)
+            messages.success(
+                request,
+                f"تمت جدولة إقفال الفترة {period.name}"
+            )
 
     close_period.short_description = "إقفال الفترات المحددة"
 
 
-
-
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('started_at', 'finished_at', 'worker', 'error')
@@ -0,0 +1,48 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from . import caching
+
+
+USER_CACHE_TIMEOUT = 60 * 60
+
+
+def user_cache_key(user_id):
+    return f"accounts:auth-user:{user_id}"
+
+
+def permissions_cache_key(user_id):
+    # رقم الإصدار يُرفع عند تعديل صلاحيات أي مجموعة أو مستخدم
+    return f"accounts:auth-permissions:{caching.get_version('permissions')}:{user_id}"
+
+
+def forget_user(user_id):
+    cache.delete_many([user_cache_key(user_id), permissions_cache_key(user_id)])
+
+
+class CachedModelBackend(ModelBackend):
+    # المستخدم ودوره وصلاحياته من الذاكرة المؤقتة بدلاً من استعلامات في كل طلب
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+            return user
+
+        return user if self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        if not hasattr(user_obj, '_perm_cache'):
+            key = permissions_cache_key(user_obj.pk)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, USER_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions
+
+        return user_obj._perm_cache
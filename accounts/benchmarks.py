@@ -0,0 +1,47 @@
+import json
+import statistics
+import time
+
+from django.db import connection
+
+from .middleware import QueryTimer
+
+
+def measure(run, repeat, setup=None):
+    # setup يُنفذ قبل كل تكرار خارج القياس (مثل إبطال الذاكرة المؤقتة)
+    # وما يعيده يُمرر إلى run
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        arguments = (setup(),) if setup else ()
+        # عداد عبر execute_wrapper بدلاً من سجل الاستعلامات المحدود بـ 9000 استعلام
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            run(*arguments)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = timer.count
+
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries,
+    }
+
+
+def format_result(name, result, before=None):
+    line = f"{name:<28} {result['median_ms']:>10.3f} ms  {result['queries']:>4} استعلام"
+    if before:
+        speedup = before['median_ms'] / result['median_ms'] if result['median_ms'] else 0
+        line += f"  | قبل: {before['median_ms']:.3f} ms  (x{speedup:.2f})"
+    return line
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,46 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# نسخة محلية لكل عملية، ورقم الإصدار في إطار التخزين المؤقت لـ Django
+# حتى يصل الإبطال إلى كل العمليات عند استخدام خادم تخزين مشترك
+_local = {}
+
+
+def _version_key(name):
+    return f"accounts:cache-version:{name}"
+
+
+def get_version(name):
+    # الإصدار قيمة لا تتكرر وليس عداداً، فحذف المفتاح من الذاكرة المؤقتة
+    # لا يعيد إصداراً قديماً ما زالت عملية أخرى تحتفظ بنسخته
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    cache.set(_version_key(name), uuid4().hex, None)
+    _local.pop(name, None)
+
+
+def invalidate(name):
+    # بعد الالتزام حتى لا تُبنى النسخة من بيانات لم تُحفظ بعد
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def cached(name, build):
+    version = get_version(name)
+    hit = _local.get(name)
+    if hit and hit[0] == version:
+        return hit[1]
+
+    value = build()
+    _local[name] = (version, value)
+    return value
@@ -0,0 +1,220 @@
+import csv
+import io
+import tempfile
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+
+from .models import Invoice, JournalEntryLine
+from .services import ZERO, opening_balance, trial_balance_accounts
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# حد Excel للورقة الواحدة 1,048,576 سطراً، منها سطر العناوين
+XLSX_SHEET_ROWS = 1048575
+
+
+class Echo:
+    # csv.writer يكتب إلى هذا الكائن فيعيد السطر مباشرة بدلاً من تخزينه
+    def write(self, value):
+        return value
+
+
+def csv_response(header, rows, filename):
+    writer = csv.writer(Echo())
+
+    def stream():
+        # BOM ليعرض Excel النص العربي بشكل صحيح
+        yield '\ufeff'
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def write_xlsx(header, rows, output, sheet_rows=XLSX_SHEET_ROWS):
+    from openpyxl import Workbook
+
+    # وضع write_only يكتب الأسطر إلى ملف مؤقت بدلاً من الاحتفاظ بها في الذاكرة
+    # ولا يفرض حد الأسطر، فنبدأ ورقة جديدة بعناوينها عند امتلاء السابقة
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        if count == sheet_rows:
+            sheet = workbook.create_sheet()
+            sheet.append(header)
+            count = 0
+        sheet.append(row)
+        count += 1
+    workbook.save(output)
+
+
+def write_csv(header, rows, output):
+    # utf-8-sig يضيف BOM ليعرض Excel النص العربي بشكل صحيح
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def write_export(export_format, header, rows, output):
+    # للمهام الخلفية: يكتب الملف كاملاً ويعيد امتداده
+    if export_format == 'xlsx':
+        write_xlsx(header, rows, output)
+        return 'xlsx'
+    write_csv(header, rows, output)
+    return 'csv'
+
+
+def xlsx_response(header, rows, filename):
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return HttpResponseBadRequest("التصدير بصيغة xlsx يتطلب تثبيت openpyxl")
+
+    output = tempfile.TemporaryFile()
+    write_xlsx(header, rows, output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def export_response(export_format, header, rows, filename):
+    if export_format == 'xlsx':
+        return xlsx_response(header, rows, filename)
+    return csv_response(header, rows, filename)
+
+
+def keyset_iterator(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    # iterator() مع MySQL يحمّل النتيجة كاملة في ذاكرة المشغل،
+    # لذلك نقرأ على دفعات محدودة مرتبة بمفتاح فريد
+    queryset = queryset.order_by(*fields)
+    last = None
+
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(reduce(or_, [
+                Q(**{
+                    **{fields[j]: last[j] for j in range(i)},
+                    f'{fields[i]}__gt': last[i],
+                })
+                for i in range(len(fields))
+            ]))
+
+        rows = list(chunk[:chunk_size])
+        yield from rows
+
+        if len(rows) < chunk_size:
+            return
+        last = [rows[-1][field] for field in fields]
+
+
+# =========================
+# مصادر الأسطر
+# =========================
+LEDGER_HEADER = ['التاريخ', 'رقم القيد', 'الوصف', 'مدين', 'دائن', 'الرصيد']
+
+
+def ledger_rows(account, date_from=None, date_to=None):
+    lines = (
+        JournalEntryLine.objects
+        .filter(account=account)
+        .values(
+            'id',
+            'journal_entry__date',
+            'journal_entry_id',
+            'journal_entry__description',
+            'debit',
+            'credit',
+        )
+    )
+
+    if date_from:
+        lines = lines.filter(journal_entry__date__gte=date_from)
+    if date_to:
+        lines = lines.filter(journal_entry__date__lte=date_to)
+
+    running_balance = opening_balance(account, date_from) if date_from else ZERO
+    if date_from:
+        yield [date_from, '', 'رصيد افتتاحي', '', '', running_balance]
+
+    for line in keyset_iterator(lines, ['journal_entry__date', 'id']):
+        running_balance += line['debit'] - line['credit']
+        yield [
+            line['journal_entry__date'],
+            line['journal_entry_id'],
+            line['journal_entry__description'],
+            line['debit'],
+            line['credit'],
+            running_balance,
+        ]
+
+
+TRIAL_BALANCE_HEADER = ['رمز الحساب', 'اسم الحساب', 'مدين', 'دائن']
+
+
+def trial_balance_rows():
+    total_debit = ZERO
+    total_credit = ZERO
+
+    for account in trial_balance_accounts().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        if account.total_debit == 0 and account.total_credit == 0:
+            continue
+        total_debit += account.total_debit
+        total_credit += account.total_credit
+        yield [account.code, account.name, account.total_debit, account.total_credit]
+
+    yield ['', 'الإجمالي', total_debit, total_credit]
+
+
+INVOICES_HEADER = [
+    'رقم الفاتورة',
+    'النوع',
+    'العميل',
+    'التاريخ',
+    'الإجمالي',
+    'معتمدة',
+    'أنشئت بواسطة',
+]
+
+
+def invoice_rows(invoices):
+    invoice_types = dict(Invoice.INVOICE_TYPES)
+
+    rows = invoices.values(
+        'id',
+        'invoice_number',
+        'invoice_type',
+        'customer_name',
+        'invoice_date',
+        'total_amount',
+        'is_approved',
+        'created_by__username',
+    )
+
+    for invoice in keyset_iterator(rows, ['id']):
+        yield [
+            invoice['invoice_number'],
+            invoice_types.get(invoice['invoice_type'], invoice['invoice_type']),
+            invoice['customer_name'],
+            invoice['invoice_date'],
+            invoice['total_amount'],
+            'نعم' if invoice['is_approved'] else 'لا',
+            invoice['created_by__username'],
+        ]
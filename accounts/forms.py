@@ -1,8 +1,61 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.forms import inlineformset_factory
+from django.forms.models import ModelChoiceIterator
+
+from . import periods, services
 from .models import Invoice, InvoiceItem, JournalEntry, JournalEntryLine
 
 
+# =========================
+# Accounting Period
+# =========================
+class PeriodChoiceIterator(ModelChoiceIterator):
+    # يُقرأ من الفهرس عند العرض فقط، فلا يُنفذ أي استعلام عند تعريف النماذج أو استيرادها
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for period in periods.all_periods():
+            yield (period.pk, str(period))
+
+    def __len__(self):
+        return len(periods.all_periods()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(periods.all_periods())
+
+
+class PeriodChoiceField(forms.ModelChoiceField):
+    # الفترات من فهرس الفترات المخزن، والحقل اختياري لأن الفترة تُحدد من التاريخ
+    iterator = PeriodChoiceIterator
+
+    def __init__(self, *args, **kwargs):
+        kwargs['empty_label'] = "تلقائياً حسب التاريخ"
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            period = periods.get_period(int(value))
+        except (TypeError, ValueError):
+            period = None
+        if period is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return period
+
+
+def resolve_period(cleaned_data, date_field):
+    # الفترة المختارة أو فترة التاريخ، دون استعلام لقراءة حالة الإقفال
+    period = cleaned_data.get('period') or periods.period_for_date(cleaned_data.get(date_field))
+    cleaned_data['period'] = period
+    return period
+
+
 # =========================
 # Invoice Form
 # =========================
@@ -30,6 +83,9 @@ class InvoiceForm(forms.ModelForm):
             'invoice_date',
             'period',
         ]
+        field_classes = {
+            'period': PeriodChoiceField,
+        }
 
     def clean_invoice_number(self):
         number = self.cleaned_data.get('invoice_number')
@@ -41,7 +97,7 @@ class InvoiceForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
-        period = cleaned_data.get('period')
+        period = resolve_period(cleaned_data, 'invoice_date')
 
         if period and period.is_closed:
             raise forms.ValidationError(
@@ -90,10 +146,13 @@ class JournalEntryForm(forms.ModelForm):
             'description',
             'period',
         ]
+        field_classes = {
+            'period': PeriodChoiceField,
+        }
 
     def clean(self):
         cleaned_data = super().clean()
-        period = cleaned_data.get('period')
+        period = resolve_period(cleaned_data, 'date')
 
         if period and period.is_closed:
             raise forms.ValidationError(
@@ -106,6 +165,37 @@ class JournalEntryForm(forms.ModelForm):
 # =========================
 # Journal Entry Line
 # =========================
+class AccountChoiceIterator(ModelChoiceIterator):
+    # يُقرأ من دليل الحسابات عند العرض فقط، فلا يُنفذ أي استعلام عند تعريف النماذج أو استيرادها
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from services.account_choices()
+
+    def __len__(self):
+        return len(services.account_choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(services.account_choices())
+
+
+class AccountChoiceField(forms.ModelChoiceField):
+    # الخيارات والتحقق من دليل الحسابات المخزن بدلاً من استعلام لكل نموذج في المجموعة
+    iterator = AccountChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return services.chart_of_accounts()[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
 class JournalEntryLineForm(forms.ModelForm):
     class Meta:
         model = JournalEntryLine
@@ -114,6 +204,9 @@ class JournalEntryLineForm(forms.ModelForm):
             'debit',
             'credit',
         ]
+        field_classes = {
+            'account': AccountChoiceField,
+        }
         widgets = {
             'account': forms.Select(attrs={'class': 'form-control'}),
             'debit': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -128,3 +221,29 @@ JournalEntryLineFormSet = inlineformset_factory(
     extra=2,
     can_delete=True
 )
+
+
+# =========================
+# Import Form
+# =========================
+class ImportForm(forms.Form):
+    KIND_CHOICES = (
+        ('entries', 'قيود يومية'),
+        ('invoices', 'فواتير'),
+    )
+
+    file = forms.FileField(
+        label="الملف (CSV أو JSONL)",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'})
+    )
+
+    kind = forms.ChoiceField(
+        choices=KIND_CHOICES,
+        label="نوع البيانات",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    approve = forms.BooleanField(
+        required=False,
+        label="اعتماد القيود المستوردة مباشرة"
+    )
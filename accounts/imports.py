@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from . import exports, periods
+from .models import Account, Invoice, InvoiceItem, JournalEntry, JournalEntryLine
+from .services import (
+    ZERO,
+    apply_approved_lines,
+    notify_entries_approved,
+    post_journal_entries,
+    safe_date,
+)
+
+
+# عدد القيود أو الفواتير في كل معاملة
+IMPORT_CHUNK_SIZE = 1000
+
+ENTRY_COLUMNS = ['entry', 'date', 'description', 'account', 'debit', 'credit']
+INVOICE_COLUMNS = [
+    'invoice_number',
+    'invoice_type',
+    'customer_name',
+    'invoice_date',
+    'description',
+    'quantity',
+    'unit_price',
+]
+
+ERRORS_HEADER = ['السطر', 'المرجع', 'الخطأ']
+
+IMPORTABLE_ENTRY_TYPES = {
+    key for key, _ in JournalEntry.ENTRY_TYPES if key != 'closing'
+}
+
+
+class RowError(Exception):
+    def __init__(self, number, message):
+        super().__init__(message)
+        self.number = number
+        self.message = message
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.lines = 0
+        self.errors = []
+
+    def add_error(self, number, reference, message):
+        self.errors.append((number, reference or '', message))
+
+    def write_errors(self, output):
+        exports.write_csv(ERRORS_HEADER, self.errors, output)
+
+
+# =========================
+# قراءة الملف سطراً سطراً
+# =========================
+def read_rows(file, file_format):
+    # file مفتوح بصيغة ثنائية، ويُقرأ دون تحميله كاملاً في الذاكرة
+    if file_format == 'jsonl':
+        for number, raw in enumerate(file, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+        return
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        # السطر الأول عناوين الأعمدة
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            yield number, row
+    finally:
+        # الغلاف يغلق الملف الأصلي عند التخلص منه، والملف ملك من فتحه
+        text.detach()
+
+
+def grouped(rows, key):
+    # أسطر المستند الواحد يجب أن تكون متتالية في الملف
+    current, group = None, []
+    for number, row in rows:
+        reference = str((row or {}).get(key) or '').strip()
+        if group and reference != current:
+            yield current, group
+            group = []
+        current = reference
+        group.append((number, row))
+
+    if group:
+        yield current, group
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# =========================
+# التحقق من القيم
+# =========================
+def _value(number, row, column, required=True):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(number, f"العمود {column} مطلوب")
+    return value
+
+
+def _date(number, row, column):
+    value = _value(number, row, column)
+    parsed = safe_date(value)
+    if parsed is None:
+        raise RowError(number, f"تاريخ غير صحيح: {value}")
+    return parsed
+
+
+def _amount(number, row, column):
+    value = _value(number, row, column, required=False) or '0'
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise RowError(number, f"مبلغ غير صحيح في {column}: {value}")
+
+    if not amount.is_finite() or amount < 0:
+        raise RowError(number, f"مبلغ غير صحيح في {column}: {value}")
+    if amount.as_tuple().exponent < -2:
+        raise RowError(number, f"المبلغ في {column} يتجاوز منزلتين عشريتين")
+    return amount
+
+
+def _check_period(number, index, value):
+    period = periods.find_period(index, value)
+    if period and period.is_closed:
+        raise RowError(number, f"الفترة {period.name} مقفلة")
+    return period
+
+
+# =========================
+# استيراد القيود
+# =========================
+def build_entry(reference, rows, accounts, period_index, user, approve):
+    number, first = rows[0]
+    if first is None:
+        raise RowError(number, "سطر غير صالح")
+    if not reference:
+        raise RowError(number, "العمود entry مطلوب")
+
+    entry_date = _date(number, first, 'date')
+    entry_type = _value(number, first, 'entry_type', required=False) or 'manual'
+    if entry_type not in IMPORTABLE_ENTRY_TYPES:
+        raise RowError(number, f"نوع قيد غير معروف: {entry_type}")
+
+    lines = []
+    for number, row in rows:
+        if row is None:
+            raise RowError(number, "سطر غير صالح")
+        if _date(number, row, 'date') != entry_date:
+            raise RowError(number, "تاريخ السطر يختلف عن تاريخ القيد")
+
+        code = _value(number, row, 'account')
+        if code not in accounts:
+            raise RowError(number, f"رمز حساب غير معروف: {code}")
+
+        debit = _amount(number, row, 'debit')
+        credit = _amount(number, row, 'credit')
+        if (debit > 0) == (credit > 0):
+            raise RowError(number, "يجب إدخال مدين أو دائن في السطر وليس كليهما")
+
+        lines.append(JournalEntryLine(account_id=accounts[code], debit=debit, credit=credit))
+
+    if len(lines) < 2:
+        raise RowError(number, "القيد يحتاج سطرين على الأقل")
+
+    total_debit = sum((line.debit for line in lines), ZERO)
+    total_credit = sum((line.credit for line in lines), ZERO)
+    if total_debit != total_credit:
+        raise RowError(number, f"القيد غير متوازن: مدين {total_debit} ≠ دائن {total_credit}")
+
+    entry = JournalEntry(
+        date=entry_date,
+        description=_value(rows[0][0], first, 'description', required=False)[:255] or reference,
+        entry_type=entry_type,
+        period=_check_period(rows[0][0], period_index, entry_date),
+        status='approved' if approve else 'draft',
+        posted=approve,
+        created_by=user,
+    )
+    return entry, lines
+
+
+def import_journal_entries(file, file_format, user, approve=False,
+                           chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    # خريطة الرموز والفترات تُحمّل مرة واحدة لكل الملف
+    accounts = dict(Account.objects.values_list('code', 'id'))
+    period_index = periods.period_index()
+    report = ImportReport()
+
+    for chunk in chunked(grouped(read_rows(file, file_format), 'entry'), chunk_size):
+        batch = []
+        for reference, rows in chunk:
+            try:
+                batch.append(build_entry(reference, rows, accounts, period_index, user, approve))
+            except RowError as e:
+                report.add_error(e.number, reference, e.message)
+
+        if batch:
+            with transaction.atomic():
+                entries = post_journal_entries(batch)
+                if approve:
+                    apply_approved_lines(batch)
+                    notify_entries_approved(entries)
+
+            report.created += len(batch)
+            report.lines += sum(len(lines) for _, lines in batch)
+
+        if progress:
+            progress(report)
+
+    return report
+
+
+# =========================
+# استيراد الفواتير
+# =========================
+def build_invoice(reference, rows, period_index, user):
+    number, first = rows[0]
+    if first is None:
+        raise RowError(number, "سطر غير صالح")
+    if not reference:
+        raise RowError(number, "العمود invoice_number مطلوب")
+
+    invoice_type = _value(number, first, 'invoice_type')
+    if invoice_type not in dict(Invoice.INVOICE_TYPES):
+        raise RowError(number, f"نوع فاتورة غير معروف: {invoice_type}")
+
+    invoice_date = _date(number, first, 'invoice_date')
+    invoice = Invoice(
+        invoice_number=reference[:50],
+        invoice_type=invoice_type,
+        customer_name=_value(number, first, 'customer_name')[:150],
+        invoice_date=invoice_date,
+        period=_check_period(number, period_index, invoice_date),
+        created_by=user,
+    )
+
+    items = []
+    for number, row in rows:
+        if row is None:
+            raise RowError(number, "سطر غير صالح")
+
+        quantity = _value(number, row, 'quantity')
+        if not quantity.isdigit() or int(quantity) == 0:
+            raise RowError(number, f"كمية غير صحيحة: {quantity}")
+
+        unit_price = _amount(number, row, 'unit_price')
+        items.append(InvoiceItem(
+            description=_value(number, row, 'description')[:200],
+            quantity=int(quantity),
+            unit_price=unit_price,
+            total_price=int(quantity) * unit_price,
+        ))
+
+    invoice.total_amount = sum((item.total_price for item in items), ZERO)
+    return invoice, items
+
+
+def import_invoices(file, file_format, user, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    period_index = periods.period_index()
+    report = ImportReport()
+
+    for chunk in chunked(grouped(read_rows(file, file_format), 'invoice_number'), chunk_size):
+        existing = set(
+            Invoice.objects
+            .filter(invoice_number__in=[reference for reference, _ in chunk])
+            .values_list('invoice_number', flat=True)
+        )
+
+        batch = []
+        seen = set()
+        for reference, rows in chunk:
+            try:
+                if reference in existing or reference in seen:
+                    raise RowError(rows[0][0], "رقم الفاتورة مستخدم مسبقاً")
+                batch.append(build_invoice(reference, rows, period_index, user))
+                seen.add(reference)
+            except RowError as e:
+                report.add_error(e.number, reference, e.message)
+
+        if batch:
+            with transaction.atomic():
+                Invoice.objects.bulk_create([invoice for invoice, _ in batch])
+
+                # MySQL لا يعيد المعرفات من bulk_create، ورقم الفاتورة فريد
+                ids = dict(
+                    Invoice.objects
+                    .filter(invoice_number__in=[invoice.invoice_number for invoice, _ in batch])
+                    .values_list('invoice_number', 'id')
+                )
+                all_items = []
+                for invoice, items in batch:
+                    invoice.pk = ids[invoice.invoice_number]
+                    for item in items:
+                        item.invoice_id = invoice.pk
+                        all_items.append(item)
+
+                InvoiceItem.objects.bulk_create(all_items, batch_size=chunk_size)
+
+            report.created += len(batch)
+            report.lines += len(all_items)
+
+        if progress:
+            progress(report)
+
+    return report
+
+
+def import_file(kind, file, file_format, user, approve=False,
+                chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    if kind == 'invoices':
+        return import_invoices(file, file_format, user, chunk_size, progress)
+    return import_journal_entries(file, file_format, user, approve, chunk_size, progress)
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
@@ -0,0 +1,280 @@
+import logging
+import tempfile
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import exports, imports, services
+from .models import Account, AccountingPeriod, BackgroundJob, JournalEntryLine
+
+
+logger = logging.getLogger(__name__)
+
+# اسم المهمة ← (الوصف، الدالة)
+HANDLERS = {}
+
+PROGRESS_EVERY = 1000
+
+# كل كم ثانية يحدّث العامل نبضة المهمة التي ينفذها
+HEARTBEAT_INTERVAL = 30
+
+
+def register(name, label):
+    def decorator(handler):
+        HANDLERS[name] = (label, handler)
+        return handler
+    return decorator
+
+
+def job_label(name):
+    return HANDLERS.get(name, (name, None))[0]
+
+
+# =========================
+# الجدولة والتنفيذ
+# =========================
+def enqueue(name, user=None, **params):
+    # المعاملات تُحفظ JSON، لذلك تُمرر التواريخ نصوصاً والسجلات بأرقامها
+    if name not in HANDLERS:
+        raise ValueError(f"مهمة غير معروفة: {name}")
+    return BackgroundJob.objects.create(name=name, params=params, created_by=user)
+
+
+def report(job, progress=None, message=None):
+    # update() مباشرة حتى يظهر التقدم للمستخدم قبل انتهاء المهمة
+    fields = {}
+    if progress is not None:
+        job.progress = fields['progress'] = max(0, min(int(progress), 100))
+    if message is not None:
+        job.message = fields['message'] = message[:255]
+    if fields:
+        BackgroundJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def fail_stale_jobs():
+    # مهمة بلا نبضة حديثة مات عاملها، ولا نعيد تشغيلها لأن الاستيراد مثلاً قد يكون نُفذ جزئياً
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.BACKGROUND_JOBS_STALE_AFTER)
+    return (
+        BackgroundJob.objects
+        .filter(status='running', heartbeat_at__lt=cutoff)
+        .update(
+            status='failed',
+            message="توقف العامل قبل إنهاء المهمة",
+            finished_at=now,
+        )
+    )
+
+
+def claim_job(worker):
+    fail_stale_jobs()
+
+    # skip_locked يسمح لعدة عمال بالالتقاط معاً دون انتظار بعضهم أو أخذ المهمة نفسها
+    with transaction.atomic():
+        job = (
+            BackgroundJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.worker = worker
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at'])
+
+    return job
+
+
+def heartbeat(job, stop):
+    # خيط مستقل باتصاله الخاص، فالمهام الطويلة مثل إعادة البناء لا تبلّغ عن تقدمها
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            BackgroundJob.objects.filter(pk=job.pk, status='running').update(heartbeat_at=timezone.now())
+    finally:
+        connections.close_all()
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.name, (None, None))[1]
+
+    stop = threading.Event()
+    beating = threading.Thread(target=heartbeat, args=(job, stop), daemon=True)
+    beating.start()
+    try:
+        if handler is None:
+            raise ValueError(f"مهمة غير معروفة: {job.name}")
+        handler(job, **job.params)
+    except Exception as e:
+        logger.exception("فشلت المهمة %s", job)
+        job.status = 'failed'
+        job.error = traceback.format_exc()
+        job.message = (" ".join(e.messages) if isinstance(e, ValidationError) else str(e))[:255]
+    else:
+        job.status = 'succeeded'
+        job.progress = 100
+    finally:
+        stop.set()
+        beating.join()
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def work(worker, once=False, poll_interval=2):
+    # حلقة عامل واحد داخل عملية مستقلة
+    while True:
+        close_old_connections()
+        job = claim_job(worker)
+
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("%s يبدأ %s", worker, job)
+        run_job(job)
+
+
+# =========================
+# ملفات النتائج
+# =========================
+def tracked(job, rows, total):
+    for count, row in enumerate(rows, start=1):
+        if count % PROGRESS_EVERY == 0:
+            report(
+                job,
+                progress=count * 99 // total if total else None,
+                message=f"تمت كتابة {count} سطر"
+            )
+        yield row
+
+
+def save_export(job, export_format, header, rows, total, filename):
+    with tempfile.TemporaryFile() as output:
+        extension = exports.write_export(export_format, header, tracked(job, rows, total), output)
+        output.seek(0)
+        job.result.save(f"{filename}.{extension}", File(output), save=False)
+
+
+# =========================
+# المهام
+# =========================
+@register('close_period', "إقفال فترة محاسبية")
+def close_period(job, period_id):
+    period = AccountingPeriod.objects.get(pk=period_id)
+    report(job, message=f"جارٍ إقفال الفترة {period.name}")
+    services.close_accounting_period(period, job.created_by)
+    report(job, message=f"تم إقفال الفترة {period.name}")
+
+
+@register('rebuild_account_balances', "إعادة بناء أرصدة الحسابات")
+def rebuild_account_balances(job):
+    services.rebuild_account_balances()
+
+
+@register('rebuild_ledger_snapshots', "إعادة بناء لقطات الأرصدة")
+def rebuild_ledger_snapshots(job):
+    services.rebuild_all_ledger_snapshots()
+
+
+@register('rebuild_daily_rollups', "إعادة بناء الأرصدة اليومية")
+def rebuild_daily_rollups(job):
+    services.rebuild_daily_rollups()
+
+
+@register('rebuild_period_balances', "إعادة بناء أرصدة الفترات")
+def rebuild_period_balances(job):
+    services.rebuild_period_balances()
+
+
+@register('export_general_ledger', "تصدير دفتر الأستاذ")
+def export_general_ledger(job, account_id, date_from=None, date_to=None, export_format='csv'):
+    account = Account.objects.get(pk=account_id)
+    date_from = services.safe_date(date_from)
+    date_to = services.safe_date(date_to)
+
+    lines = JournalEntryLine.objects.filter(account=account)
+    if date_from:
+        lines = lines.filter(journal_entry__date__gte=date_from)
+    if date_to:
+        lines = lines.filter(journal_entry__date__lte=date_to)
+
+    save_export(
+        job,
+        export_format,
+        exports.LEDGER_HEADER,
+        exports.ledger_rows(account, date_from, date_to),
+        lines.count(),
+        f"general_ledger_{account.code}"
+    )
+
+
+@register('export_trial_balance', "تصدير ميزان المراجعة")
+def export_trial_balance(job, export_format='csv'):
+    save_export(
+        job,
+        export_format,
+        exports.TRIAL_BALANCE_HEADER,
+        exports.trial_balance_rows(),
+        Account.objects.count(),
+        "trial_balance"
+    )
+
+
+@register('export_invoices', "تصدير الفواتير")
+def export_invoices(job, filters=None, export_format='csv'):
+    invoices = services.filter_invoices(**(filters or {}))
+
+    save_export(
+        job,
+        export_format,
+        exports.INVOICES_HEADER,
+        exports.invoice_rows(invoices),
+        invoices.count(),
+        "invoices"
+    )
+
+
+@register('import_ledger', "استيراد قيود أو فواتير")
+def import_ledger(job, path, kind='entries', file_format='csv', approve=False):
+    size = default_storage.size(path)
+
+    def summary(result):
+        return (
+            f"تم استيراد {result.created} مستند ({result.lines} سطر)، "
+            f"أخطاء: {len(result.errors)}"
+        )
+
+    try:
+        with default_storage.open(path, 'rb') as file:
+            def progress(result):
+                # الموضع في الملف يكفي لتقدير التقدم دون عدّ الأسطر مسبقاً
+                report(job, progress=file.tell() * 99 // size if size else None, message=summary(result))
+
+            result = imports.import_file(
+                kind, file, file_format, job.created_by, approve, progress=progress
+            )
+    finally:
+        default_storage.delete(path)
+
+    report(job, message=summary(result))
+
+    if result.errors:
+        with tempfile.TemporaryFile() as output:
+            result.write_errors(output)
+            output.seek(0)
+            job.result.save(f"import_errors_{job.pk}.csv", File(output), save=False)
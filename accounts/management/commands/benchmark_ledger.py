@@ -0,0 +1,181 @@
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import benchmarks, caching, seeding, services
+from accounts.models import Account, Invoice, JournalEntry, JournalEntryLine, User
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس زمن واستعلامات ميزان المراجعة ودفتر الأستاذ ولوحة المدير المالي "
+        "واعتماد الفاتورة وترحيل القيد على عدة أحجام من البيانات المولدة. "
+        "يعمل على قاعدة اختبار مؤقتة؛ احفظ النتائج مع --output وقارن بها لاحقاً مع --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,50000',
+            help="أعداد القيود مفصولة بفواصل، تُولد تراكمياً"
+        )
+        parser.add_argument('--accounts', type=int, default=200)
+        parser.add_argument(
+            '--invoices-ratio',
+            type=float,
+            default=0.2,
+            help="عدد الفواتير نسبةً إلى عدد القيود"
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="حفظ النتائج في ملف JSON")
+        parser.add_argument('--baseline', help="ملف JSON لنتائج سابقة للمقارنة")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        except ValueError:
+            raise CommandError("--sizes يجب أن تكون أعداداً مفصولة بفواصل")
+
+        baseline = {}
+        if options['baseline']:
+            baseline = {
+                run['entries']: run['results']
+                for run in benchmarks.load_results(options['baseline'])['runs']
+            }
+
+        # قاعدة اختبار وذاكرة مؤقتة محلية حتى لا تُمس بيانات الإنتاج أو ذاكرتها المشتركة
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            }):
+                runs = self.run_sizes(sizes, options, baseline)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            benchmarks.save_results(options['output'], {
+                'vendor': connection.vendor,
+                'generated_at': timezone.now().isoformat(),
+                'repeat': options['repeat'],
+                'runs': runs,
+            })
+            self.stdout.write(self.style.SUCCESS(f"حُفظت النتائج في {options['output']}"))
+
+    def run_sizes(self, sizes, options, baseline):
+        rng = random.Random(options['seed'])
+        year = timezone.localdate().year
+        seeding.seed_chart_of_accounts(options['accounts'])
+
+        accountant = User.objects.create_superuser('bench-accountant', role='accountant')
+        manager = User.objects.create_superuser('bench-manager', role='manager')
+        accountant_client, manager_client = Client(), Client()
+        accountant_client.force_login(accountant)
+        manager_client.force_login(manager)
+
+        runs = []
+        entries = invoices = 0
+        for size in sizes:
+            target_invoices = int(size * options['invoices_ratio'])
+            entries += seeding.seed_entries(size - entries, year, rng=rng)
+            invoices += seeding.seed_invoices(target_invoices - invoices, year, rng=rng)
+
+            results = self.run_benchmarks(accountant_client, manager_client, accountant, year, rng, options['repeat'])
+            runs.append({
+                'entries': size,
+                'invoices': target_invoices,
+                'lines': JournalEntryLine.objects.count(),
+                'results': results,
+            })
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"== {size} قيد | {target_invoices} فاتورة | التكرار: {options['repeat']}"
+            ))
+            before = baseline.get(size, {})
+            for name, result in results.items():
+                self.stdout.write(benchmarks.format_result(name, result, before.get(name)))
+
+        return runs
+
+    def run_benchmarks(self, accountant_client, manager_client, user, year, rng, repeat):
+        account = (
+            Account.objects
+            .annotate(lines_count=Count('journalentryline'))
+            .order_by('-lines_count')
+            .first()
+        )
+        pending = iter(
+            Invoice.objects
+            .filter(is_approved=False)
+            .order_by('id')
+            .values_list('id', flat=True)[:repeat]
+        )
+        entry_lines = list(
+            Account.objects
+            .filter(children__isnull=True)
+            .values_list('id', flat=True)[:2]
+        )
+
+        def get(client, url, expected=200):
+            response = client.get(url)
+            if response.status_code != expected:
+                raise CommandError(f"{url} أعاد {response.status_code}")
+
+        def next_invoice():
+            try:
+                return next(pending)
+            except StopIteration:
+                raise CommandError("لا توجد فواتير غير معتمدة كافية لقياس الاعتماد")
+
+        def new_entry():
+            amount = Decimal(rng.randint(100, 10000))
+            return (
+                JournalEntry(
+                    date=date(year, rng.randint(1, 12), 1),
+                    description=f"{seeding.SEED_PREFIX} قياس الترحيل",
+                    created_by=user,
+                ),
+                [
+                    JournalEntryLine(account_id=entry_lines[0], debit=amount, credit=services.ZERO),
+                    JournalEntryLine(account_id=entry_lines[1], debit=services.ZERO, credit=amount),
+                ],
+            )
+
+        return {
+            'trial_balance': benchmarks.measure(
+                lambda: get(accountant_client, reverse('trial_balance')),
+                repeat
+            ),
+            'general_ledger': benchmarks.measure(
+                lambda: get(accountant_client, f"{reverse('general_ledger')}?account={account.pk}"),
+                repeat
+            ),
+            # دون الذاكرة المؤقتة حتى يُقاس التجميع الفعلي
+            'manager_dashboard': benchmarks.measure(
+                lambda _: get(manager_client, reverse('manager_dashboard')),
+                repeat,
+                setup=lambda: caching.bump_version('profit_and_loss')
+            ),
+            'approve_invoice': benchmarks.measure(
+                lambda invoice_id: get(accountant_client, reverse('approve_invoice', args=[invoice_id]), 302),
+                repeat,
+                setup=next_invoice
+            ),
+            'post_entry': benchmarks.measure(
+                lambda batch: services.post_journal_entries([batch]),
+                repeat,
+                setup=new_entry
+            ),
+        }
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from accounts import services
+from accounts.benchmarks import format_result, load_results, measure, save_results
+from accounts.models import Account, JournalEntryLine
+
+
+class Command(BaseCommand):
+    help = (
+        "قياس زمن استعلامات دفتر الأستاذ وميزان المراجعة ولوحة المدير المالي "
+        "وعرض خطط التنفيذ. شغّله قبل الترحيل مع --output ثم بعده مع --baseline للمقارنة."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--explain', action='store_true', help="عرض خطة تنفيذ كل استعلام")
+        parser.add_argument('--output', help="حفظ النتائج في ملف JSON")
+        parser.add_argument('--baseline', help="ملف JSON لنتائج سابقة للمقارنة")
+
+    def handle(self, *args, **options):
+        account = (
+            Account.objects
+            .annotate(lines_count=Count('journalentryline'))
+            .order_by('-lines_count')
+            .first()
+        )
+        if account is None:
+            raise CommandError("لا توجد حسابات لقياسها")
+
+        ledger_lines = (
+            JournalEntryLine.objects
+            .filter(account=account)
+            .select_related('journal_entry')
+            .order_by('journal_entry__date', 'id')
+        )
+
+        benchmarks = {
+            'general_ledger': (
+                lambda: services.general_ledger(account),
+                ledger_lines,
+            ),
+            'trial_balance_grouped': (
+                lambda: list(services.trial_balance_accounts(materialized=False)),
+                services.trial_balance_accounts(materialized=False),
+            ),
+            'trial_balance_materialized': (
+                lambda: list(services.trial_balance_accounts(materialized=True)),
+                services.trial_balance_accounts(materialized=True),
+            ),
+            'manager_dashboard': (
+                services.profit_and_loss,
+                JournalEntryLine.objects.filter(
+                    account__account_type='revenue',
+                    journal_entry__status='approved'
+                ).values('credit'),
+            ),
+        }
+
+        results = {}
+        for name, (run, queryset) in benchmarks.items():
+            if options['explain']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"== {name}"))
+                self.stdout.write(queryset.explain())
+
+            results[name] = measure(run, options['repeat'])
+
+        baseline = {}
+        if options['baseline']:
+            baseline = load_results(options['baseline'])['results']
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"الحساب المقاس: {account} | التكرار: {options['repeat']}"
+        ))
+        for name, result in results.items():
+            self.stdout.write(format_result(name, result, baseline.get(name)))
+
+        if options['output']:
+            save_results(options['output'], {
+                'vendor': connection.vendor,
+                'account': account.pk,
+                'results': results,
+            })
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import imports
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "استيراد القيود أو الفواتير من ملف CSV أو JSONL على دفعات. "
+        "أسطر القيد الواحد (أو الفاتورة) يجب أن تكون متتالية في الملف. "
+        f"أعمدة القيود: {', '.join(imports.ENTRY_COLUMNS)} | "
+        f"أعمدة الفواتير: {', '.join(imports.INVOICE_COLUMNS)}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--kind', choices=['entries', 'invoices'], default='entries')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="يُستنتج من امتداد الملف إن لم يُحدد")
+        parser.add_argument('--user', required=True, help="اسم المستخدم الذي تُسجل باسمه المستندات")
+        parser.add_argument('--approve', action='store_true', help="اعتماد القيود المستوردة مباشرة")
+        parser.add_argument('--chunk-size', type=int, default=imports.IMPORT_CHUNK_SIZE)
+        parser.add_argument('--errors', help="حفظ تقرير الأخطاء في ملف CSV")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"المستخدم {options['user']} غير موجود")
+
+        file_format = options['format'] or imports.detect_format(options['path'])
+        started = time.perf_counter()
+
+        def progress(result):
+            self.stdout.write(
+                f"\r{result.created} مستند | {result.lines} سطر | {len(result.errors)} خطأ",
+                ending=''
+            )
+
+        with open(options['path'], 'rb') as file:
+            result = imports.import_file(
+                options['kind'],
+                file,
+                file_format,
+                user,
+                options['approve'],
+                options['chunk_size'],
+                progress
+            )
+
+        self.stdout.write('')
+        elapsed = time.perf_counter() - started
+
+        if result.errors:
+            if options['errors']:
+                with open(options['errors'], 'wb') as output:
+                    result.write_errors(output)
+                self.stdout.write(self.style.WARNING(
+                    f"{len(result.errors)} خطأ، التفاصيل في {options['errors']}"
+                ))
+            else:
+                for number, reference, message in result.errors[:20]:
+                    self.stdout.write(self.style.WARNING(f"السطر {number} ({reference}): {message}"))
+                if len(result.errors) > 20:
+                    self.stdout.write(self.style.WARNING(
+                        f"... و {len(result.errors) - 20} خطأ آخر، استخدم --errors لحفظها كاملة"
+                    ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"تم استيراد {result.created} مستند ({result.lines} سطر) في {elapsed:.1f} ثانية"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import AccountBalance
+from accounts.services import rebuild_account_balances
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء جدول أرصدة الحسابات من أسطر القيود"
+
+    def handle(self, *args, **options):
+        rebuild_account_balances()
+        self.stdout.write(self.style.SUCCESS(
+            f"تمت إعادة بناء أرصدة {AccountBalance.objects.count()} حساب"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import AccountClosure
+from accounts.services import rebuild_account_closure
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء جدول الإغلاق لشجرة الحسابات"
+
+    def handle(self, *args, **options):
+        rebuild_account_closure()
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء {AccountClosure.objects.count()} رابط في شجرة الحسابات"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import DailyAccountRollup
+from accounts.services import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء التجميع اليومي للقيود المعتمدة من أسطر القيود"
+
+    def handle(self, *args, **options):
+        rebuild_daily_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء {DailyAccountRollup.objects.count()} سجل تجميع يومي"
+        ))
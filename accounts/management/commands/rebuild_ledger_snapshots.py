@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import LedgerSnapshot
+from accounts.services import rebuild_all_ledger_snapshots
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء لقطات أرصدة دفتر الأستاذ لكل الفترات المقفلة"
+
+    def handle(self, *args, **options):
+        rebuild_all_ledger_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء {LedgerSnapshot.objects.count()} لقطة رصيد"
+        ))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from accounts.models import Invoice, InvoiceItem
+
+
+class Command(BaseCommand):
+    help = "إعادة احتساب إجماليات البنود والفواتير وتصحيح أي انحراف، على دفعات"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed_items = 0
+        fixed_invoices = 0
+        last_id = 0
+
+        while True:
+            invoices = list(
+                Invoice.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'total_amount')[:batch_size]
+            )
+            if not invoices:
+                break
+
+            ids = [invoice_id for invoice_id, _ in invoices]
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                fixed_items += (
+                    InvoiceItem.objects
+                    .filter(invoice_id__in=ids)
+                    .exclude(total_price=F('quantity') * F('unit_price'))
+                    .update(total_price=F('quantity') * F('unit_price'))
+                )
+
+                totals = dict(
+                    InvoiceItem.objects
+                    .filter(invoice_id__in=ids)
+                    .values('invoice_id')
+                    .annotate(total=InvoiceItem.LINE_TOTAL)
+                    .order_by()
+                    .values_list('invoice_id', 'total')
+                )
+
+                drifted = [
+                    Invoice(id=invoice_id, total_amount=totals.get(invoice_id, 0))
+                    for invoice_id, total_amount in invoices
+                    if total_amount != totals.get(invoice_id, 0)
+                ]
+                Invoice.objects.bulk_update(drifted, ['total_amount'])
+                fixed_invoices += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"تم تصحيح {fixed_items} بند و {fixed_invoices} فاتورة"
+        ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import AccountPeriodBalance
+from accounts.services import ZERO, expected_period_balances, rebuild_period_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "مطابقة جدول أرصدة الحسابات لكل فترة مع أسطر القيود المعتمدة، "
+        "وإعادة بنائه مع --fix"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+
+    def handle(self, *args, **options):
+        expected, _ = expected_period_balances()
+
+        stored = {
+            (row[0], row[1]): row[2:]
+            for row in AccountPeriodBalance.objects.values_list(
+                'period_id', 'account_id', 'opening', 'debit', 'credit', 'closing'
+            ).iterator(chunk_size=2000)
+        }
+
+        mismatches = 0
+        for key in expected.keys() | stored.keys():
+            want = expected.get(key, (ZERO, ZERO, ZERO, ZERO))
+            have = stored.get(key, (ZERO, ZERO, ZERO, ZERO))
+            if want != have:
+                mismatches += 1
+                period_id, account_id = key
+                self.stdout.write(self.style.WARNING(
+                    f"الفترة {period_id} / الحساب {account_id}: "
+                    f"المخزن (افتتاحي، مدين، دائن، ختامي) {have} ≠ الفعلي {want}"
+                ))
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(
+                f"تمت مطابقة {len(stored)} رصيد مع دفتر القيود، لا فروقات"
+            ))
+            return
+
+        if options['fix']:
+            rebuild_period_balances()
+            self.stdout.write(self.style.SUCCESS(
+                f"تم إعادة بناء أرصدة الفترات بعد {mismatches} فرق"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"{mismatches} رصيد غير مطابق، شغّل الأمر مع --fix لإعادة البناء"
+            ))
@@ -0,0 +1,62 @@
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "تشغيل عمال المهام الخلفية (الإقفال، التصدير، إعادة البناء) "
+        "في مجموعة عمليات تلتقط المهام من جدول BackgroundJob دون وسيط خارجي"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="تنفيذ المهام المنتظرة ثم الخروج بدلاً من الانتظار الدائم"
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.BACKGROUND_JOBS_POLL_INTERVAL
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        host = socket.gethostname()
+
+        # لا تُورّث العمليات الفرعية اتصال قاعدة البيانات المفتوح في العملية الأم
+        connections.close_all()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"تشغيل {processes} عامل على {host}"
+        ))
+
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=django.setup)
+        try:
+            futures = [
+                pool.submit(
+                    jobs.work,
+                    f"{host}:{os.getpid()}:{number}",
+                    options['once'],
+                    options['poll_interval']
+                )
+                for number in range(processes)
+            ]
+            for future in as_completed(futures):
+                future.result()
+        except KeyboardInterrupt:
+            self.stdout.write("إيقاف العمال...")
+            pool.shutdown(wait=False, cancel_futures=True)
+            return
+
+        pool.shutdown()
+        self.stdout.write(self.style.SUCCESS("انتهت المهام المنتظرة"))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "توليد بيانات تجريبية: دليل حسابات وفترات شهرية وقيود متوازنة وفواتير، "
+        "لقياس الأداء على أحجام بيانات واقعية. لا تشغّله على قاعدة الإنتاج."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=200, help="عدد الحسابات الفرعية")
+        parser.add_argument('--entries', type=int, default=10000)
+        parser.add_argument('--invoices', type=int, default=2000)
+        parser.add_argument('--year', type=int, default=timezone.localdate().year)
+        parser.add_argument('--seed', type=int, help="بذرة المولد العشوائي لتكرار نفس البيانات")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        created = seeding.seed_ledger(
+            options['accounts'],
+            options['entries'],
+            options['invoices'],
+            options['year'],
+            options['seed']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"تم إنشاء {created['accounts']} حساب و{created['entries']} قيد "
+            f"و{created['invoices']} فاتورة في {time.perf_counter() - started:.1f} ثانية"
+        ))
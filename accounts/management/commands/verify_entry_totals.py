@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import JournalEntry
+from accounts.services import entry_totals_drift
+
+
+class Command(BaseCommand):
+    help = "التحقق من تطابق مجاميع القيود المخزنة مع مجموع أسطرها، وتصحيحها مع --fix"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked = 0
+        drifted_count = 0
+        last_id = 0
+
+        while True:
+            ids = list(
+                JournalEntry.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            with transaction.atomic():
+                drifted = entry_totals_drift(ids)
+                for entry in drifted:
+                    self.stdout.write(self.style.WARNING(
+                        f"القيد {entry.id}: المجموع الفعلي مدين {entry.total_debit} / دائن {entry.total_credit}"
+                    ))
+
+                if options['fix'] and drifted:
+                    JournalEntry.objects.bulk_update(
+                        drifted,
+                        ['total_debit', 'total_credit', 'is_balanced']
+                    )
+            drifted_count += len(drifted)
+
+        if drifted_count and not options['fix']:
+            self.stdout.write(self.style.ERROR(
+                f"{drifted_count} قيد من {checked} مجاميعه غير مطابقة، شغّل الأمر مع --fix للتصحيح"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"تم فحص {checked} قيد" + (f" وتصحيح {drifted_count}" if drifted_count else "، كل المجاميع مطابقة")
+        ))
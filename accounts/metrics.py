@@ -0,0 +1,86 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+
+# حدود الفئات بالثواني لزمن الطلب وزمن قاعدة البيانات، وبالعدد لعدد الاستعلامات
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS = (
+    ('duration', 'smartfinance_request_duration_seconds', "زمن الطلب الكلي", DURATION_BUCKETS),
+    ('db_duration', 'smartfinance_request_db_duration_seconds', "زمن استعلامات قاعدة البيانات", DURATION_BUCKETS),
+    ('queries', 'smartfinance_request_queries', "عدد استعلامات قاعدة البيانات", QUERY_BUCKETS),
+)
+
+
+class Histogram:
+    # عدادات ثابتة الحجم لكل فئة، والمئين يُقدّر بالاستيفاء داخل الفئة
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0
+
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    # ما بعد آخر حد لا نعرف مداه
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+
+        return self.buckets[-1]
+
+
+# لكل عملية مجموعتها الخاصة؛ كل عامل WSGI يعرض ما خدمه هو
+_lock = threading.Lock()
+_views = defaultdict(lambda: {
+    key: Histogram(buckets) for key, _, _, buckets in METRICS
+})
+
+
+def observe(view_name, duration, db_duration, queries):
+    with _lock:
+        histograms = _views[view_name]
+        histograms['duration'].observe(duration)
+        histograms['db_duration'].observe(db_duration)
+        histograms['queries'].observe(queries)
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        for key, name, help_text, _ in METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for view_name in sorted(_views):
+                histogram = _views[view_name][key]
+                for q in QUANTILES:
+                    lines.append(
+                        f'{name}{{view="{view_name}",quantile="{q}"}} {histogram.quantile(q):.6g}'
+                    )
+                lines.append(f'{name}_sum{{view="{view_name}"}} {histogram.sum:.6g}')
+                lines.append(f'{name}_count{{view="{view_name}"}} {histogram.count}')
+
+    return "\n".join(lines) + "\n"
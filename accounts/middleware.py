@@ -0,0 +1,48 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class QueryTimer:
+    # يُمرر إلى connection.execute_wrapper فيقيس كل استعلام دون الحاجة إلى DEBUG
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    # زمن الطلب وعدد الاستعلامات وزمنها لكل اسم مسار
+    # (استجابات التدفق تُنفذ استعلاماتها بعد خروج الطلب من هنا فلا تُحسب)
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match and match.url_name:
+            metrics.observe(
+                match.view_name,
+                time.perf_counter() - started,
+                timer.duration,
+                timer.count
+            )
+
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_account_balances(apps, schema_editor):
+    AccountBalance = apps.get_model('accounts', 'AccountBalance')
+    JournalEntryLine = apps.get_model('accounts', 'JournalEntryLine')
+
+    totals = (
+        JournalEntryLine.objects
+        .values('account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+    AccountBalance.objects.bulk_create(
+        [
+            AccountBalance(
+                account_id=row['account_id'],
+                debit=row['total_debit'] or 0,
+                credit=row['total_credit'] or 0,
+            )
+            for row in totals
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_invoice_period_journalentry_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='accounts.account', verbose_name='الحساب')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي المدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي الدائن')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_account_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_accountbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField(verbose_name='حتى تاريخ')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي المدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي الدائن')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='accounts.account', verbose_name='الحساب')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='accounts.accountingperiod', verbose_name='الفترة المحاسبية')),
+            ],
+            options={
+                'ordering': ['account', 'as_of'],
+                'indexes': [models.Index(fields=['account', 'as_of'], name='accounts_le_account_0eea06_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'period'), name='unique_ledger_snapshot_per_period')],
+            },
+        ),
+    ]
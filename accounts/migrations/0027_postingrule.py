@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_reporting_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_type', models.CharField(choices=[('sale', 'فاتورة بيع'), ('purchase', 'فاتورة شراء')], max_length=10, unique=True, verbose_name='نوع الفاتورة')),
+                ('credit_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account', verbose_name='الحساب الدائن')),
+                ('debit_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.account', verbose_name='الحساب المدين')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_postingrule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['-created_at', '-id'], name='entry_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='entry_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 21:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_daily_rollups(apps, schema_editor):
+    DailyAccountRollup = apps.get_model('accounts', 'DailyAccountRollup')
+    JournalEntryLine = apps.get_model('accounts', 'JournalEntryLine')
+
+    totals = (
+        JournalEntryLine.objects
+        .filter(journal_entry__status='approved')
+        .values('journal_entry__date', 'account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+    DailyAccountRollup.objects.bulk_create(
+        [
+            DailyAccountRollup(
+                date=row['journal_entry__date'],
+                account_id=row['account_id'],
+                debit=row['total_debit'] or 0,
+                credit=row['total_credit'] or 0,
+            )
+            for row in totals.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_entry_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='التاريخ')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي المدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='إجمالي الدائن')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.account', verbose_name='الحساب')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'account'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_daily_rollups, migrations.RunPython.noop),
+    ]
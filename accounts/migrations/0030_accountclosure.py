@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 21:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_account_closure(apps, schema_editor):
+    Account = apps.get_model('accounts', 'Account')
+    AccountClosure = apps.get_model('accounts', 'AccountClosure')
+
+    parents = dict(Account.objects.values_list('id', 'parent_id'))
+    rows = []
+    for account_id in parents:
+        node, depth = account_id, 0
+        while node is not None:
+            rows.append(AccountClosure(ancestor_id=node, descendant_id=account_id, depth=depth))
+            node, depth = parents.get(node), depth + 1
+
+    AccountClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_dailyaccountrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='accounts.account')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='accounts.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='closure_descendant_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_account_closure')],
+            },
+        ),
+        migrations.RunPython(populate_account_closure, migrations.RunPython.noop),
+    ]
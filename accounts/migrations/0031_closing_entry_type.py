@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_accountclosure'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalentry',
+            name='entry_type',
+            field=models.CharField(choices=[('manual', 'قيد يدوي'), ('invoice', 'فاتورة'), ('adjustment', 'قيد تسوية'), ('opening', 'قيد افتتاحي'), ('closing', 'قيد إقفال')], default='manual', max_length=20),
+        ),
+    ]
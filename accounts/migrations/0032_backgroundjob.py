@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 23:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_closing_entry_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='المهمة')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='المعاملات')),
+                ('status', models.CharField(choices=[('queued', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('succeeded', 'مكتملة'), ('failed', 'فشلت')], default='queued', max_length=20, verbose_name='الحالة')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='نسبة الإنجاز')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='آخر رسالة')),
+                ('error', models.TextField(blank=True, verbose_name='الخطأ')),
+                ('result', models.FileField(blank=True, upload_to='jobs/%Y/%m/', verbose_name='ملف النتيجة')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='العامل')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='background_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at', 'id'], name='job_status_created_idx'), models.Index(fields=['created_by', '-created_at'], name='job_user_created_idx')],
+            },
+        ),
+    ]
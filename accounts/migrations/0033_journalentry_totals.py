@@ -0,0 +1,78 @@
+# Generated by Django 6.0 on 2026-10-18 23:40
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_entry_totals(apps, schema_editor):
+    JournalEntry = apps.get_model('accounts', 'JournalEntry')
+    JournalEntryLine = apps.get_model('accounts', 'JournalEntryLine')
+
+    last_id = 0
+    while True:
+        ids = list(
+            JournalEntry.objects
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:1000]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        totals = {
+            row['journal_entry_id']: (row['total_debit'] or 0, row['total_credit'] or 0)
+            for row in (
+                JournalEntryLine.objects
+                .filter(journal_entry_id__in=ids)
+                .values('journal_entry_id')
+                .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+                .order_by()
+            )
+        }
+        JournalEntry.objects.bulk_update(
+            [
+                JournalEntry(
+                    id=entry_id,
+                    total_debit=debit,
+                    total_credit=credit,
+                    is_balanced=debit == credit,
+                )
+                for entry_id, (debit, credit) in totals.items()
+            ],
+            ['total_debit', 'total_credit', 'is_balanced']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0032_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='is_balanced',
+            field=models.BooleanField(default=True, verbose_name='متوازن'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='total_credit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='إجمالي الدائن'),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='total_debit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='إجمالي المدين'),
+        ),
+        migrations.RunPython(populate_entry_totals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['is_balanced', '-created_at', '-id'], name='entry_balanced_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['-total_debit'], name='entry_total_debit_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 6.0 on 2026-10-19 00:10
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_period_balances(apps, schema_editor):
+    AccountingPeriod = apps.get_model('accounts', 'AccountingPeriod')
+    AccountPeriodBalance = apps.get_model('accounts', 'AccountPeriodBalance')
+    JournalEntryLine = apps.get_model('accounts', 'JournalEntryLine')
+
+    periods = list(AccountingPeriod.objects.order_by('start_date', 'id'))
+
+    movements = defaultdict(dict)
+    rows = (
+        JournalEntryLine.objects
+        .filter(journal_entry__status='approved', journal_entry__period__isnull=False)
+        .values('journal_entry__period_id', 'account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+    for row in rows:
+        movements[row['account_id']][row['journal_entry__period_id']] = (
+            row['total_debit'] or 0,
+            row['total_credit'] or 0,
+        )
+
+    balances = []
+    for account_id, by_period in movements.items():
+        balance = None
+        for period in periods:
+            if balance is None and period.pk not in by_period:
+                continue
+            opening = balance or 0
+            debit, credit = by_period.get(period.pk, (0, 0))
+            balance = opening + debit - credit
+            balances.append(AccountPeriodBalance(
+                period_id=period.pk,
+                account_id=account_id,
+                opening=opening,
+                debit=debit,
+                credit=credit,
+                closing=balance,
+                is_frozen=period.is_closed,
+            ))
+
+    AccountPeriodBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0033_journalentry_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opening', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='الرصيد الافتتاحي')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='حركة المدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='حركة الدائن')),
+                ('closing', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='الرصيد الختامي')),
+                ('is_frozen', models.BooleanField(default=False, verbose_name='مجمد')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_balances', to='accounts.account', verbose_name='الحساب')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_balances', to='accounts.accountingperiod', verbose_name='الفترة المحاسبية')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'period'], name='period_balance_account_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'account'), name='unique_account_period_balance')],
+            },
+        ),
+        migrations.RunPython(populate_period_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0036_backgroundjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='batch_reference',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, verbose_name='مرجع دفعة الترحيل'),
+        ),
+    ]
@@ -2,9 +2,11 @@ from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from django.db.models import F, Sum
 from decimal import Decimal
 
+from . import periods
+
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -73,21 +75,39 @@ class Invoice(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            # قائمة الفواتير مرتبة بالأحدث مع ترقيم بالمؤشر على (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='invoice_created_idx'),
+            models.Index(fields=['is_approved', '-created_at', '-id'], name='invoice_status_created_idx'),
+            models.Index(fields=['invoice_type', '-created_at', '-id'], name='invoice_type_created_idx'),
+            models.Index(fields=['period', '-created_at', '-id'], name='invoice_period_created_idx'),
+            models.Index(fields=['invoice_date'], name='invoice_date_idx'),
+            # يخدم المطابقة والبحث بالبادئة (LIKE 'abc%')
+            models.Index(fields=['customer_name'], name='invoice_customer_idx'),
+        ]
+
     def __str__(self):
         return self.invoice_number
 
     def calculate_total(self):
-        total = Decimal('0.00')
-        for item in self.items.all():
-            total += item.total_price
-        return total
+        return self.items.aggregate(total=InvoiceItem.LINE_TOTAL)['total'] or Decimal('0.00')
 
     def clean(self):
-        if self.period and self.period.is_closed:
+        if periods.is_closed(self.period_id):
             raise ValidationError("لا يمكن إنشاء فاتورة في فترة محاسبية مقفلة")
 
     def save(self, *args, **kwargs):
+        periods.assign_period(self, self.invoice_date)
         self.full_clean()
+
+        # الإجمالي تحدّثه البنود بالفرق في قاعدة البيانات، فحفظ نسخة قديمة من الفاتورة
+        # لا يكتب قيمتها في الذاكرة فوقه إلا إذا طُلب صراحة في update_fields
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total_amount'
+            ]
         super().save(*args, **kwargs)
 
 
@@ -102,17 +122,48 @@ class InvoiceItem(models.Model):
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     total_price = models.DecimalField(max_digits=14, decimal_places=2, editable=False, default=0)
 
-def save(self, *args, **kwargs):
-  
-    if self.invoice.period and self.invoice.period.is_closed:
-        raise ValidationError("لا يمكن إضافة بنود لفاتورة في فترة محاسبية مقفلة")
+    LINE_TOTAL = Sum(
+        F('quantity') * F('unit_price'),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2)
+    )
+
+    def save(self, *args, **kwargs):
+        if periods.is_closed(self.invoice.period_id):
+            raise ValidationError("لا يمكن إضافة بنود لفاتورة في فترة محاسبية مقفلة")
+
+        previous = None
+        if self.pk:
+            previous = (
+                InvoiceItem.objects
+                .filter(pk=self.pk)
+                .values('invoice_id', 'total_price')
+                .first()
+            )
+
+        self.total_price = self.quantity * self.unit_price
+        super().save(*args, **kwargs)
+
+        # تحديث إجمالي الفاتورة بالفرق فقط بدلاً من إعادة جمع كل البنود
+        if previous and previous['invoice_id'] != self.invoice_id:
+            self._add_to_invoice_total(previous['invoice_id'], -previous['total_price'])
+            previous = None
+
+        delta = self.total_price - (previous['total_price'] if previous else 0)
+        self._add_to_invoice_total(self.invoice_id, delta)
+        self.invoice.total_amount += delta
 
-    self.total_price = self.quantity * self.unit_price
-    super().save(*args, **kwargs)
+    def delete(self, *args, **kwargs):
+        invoice_id, total_price = self.invoice_id, self.total_price
+        result = super().delete(*args, **kwargs)
+        self._add_to_invoice_total(invoice_id, -total_price)
+        return result
 
-    invoice = self.invoice
-    invoice.total_amount = invoice.calculate_total()
-    invoice.save(update_fields=['total_amount'])
+    @staticmethod
+    def _add_to_invoice_total(invoice_id, delta):
+        if delta:
+            Invoice.objects.filter(pk=invoice_id).update(
+                total_amount=F('total_amount') + delta
+            )
 
 
 class Account(models.Model):
@@ -147,11 +198,52 @@ class Account(models.Model):
             ("access_general_ledger", "الدخول إلى دفتر الأستاذ"),
             ("view_trial_balance", "Can view trial balance"),
         ]
+        indexes = [
+            models.Index(fields=['account_type', 'code'], name='account_type_code_idx'),
+        ]
+
+    def clean(self):
+        if self.pk and self.parent_id and AccountClosure.objects.filter(
+            ancestor_id=self.pk,
+            descendant_id=self.parent_id
+        ).exists():
+            raise ValidationError("لا يمكن جعل الحساب تابعاً لأحد فروعه")
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
 
+class AccountClosure(models.Model):
+    # كل زوج (أب، فرع) في شجرة الحسابات، بما فيه الحساب مع نفسه بعمق 0
+    ancestor = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+
+    descendant = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ancestor', 'descendant'],
+                name='unique_account_closure'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor'], name='closure_descendant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} → {self.descendant_id} ({self.depth})"
+
+
 class JournalEntry(models.Model):
     date = models.DateField(verbose_name="تاريخ القيد")
     description = models.CharField(max_length=255)
@@ -172,6 +264,7 @@ class JournalEntry(models.Model):
         ('invoice', 'فاتورة'),
         ('adjustment', 'قيد تسوية'),
         ('opening', 'قيد افتتاحي'),
+        ('closing', 'قيد إقفال'),
     )
 
     entry_type = models.CharField(
@@ -202,16 +295,52 @@ class JournalEntry(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # مجاميع الأسطر تُحدّث عند كتابتها حتى لا يُعاد جمعها في كل عرض
+    total_debit = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي المدين'
+    )
+
+    total_credit = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي الدائن'
+    )
+
+    is_balanced = models.BooleanField(default=True, verbose_name='متوازن')
+
+    # MySQL لا يعيد المعرفات من bulk_create، فيُقرأ معرف كل قيد بمرجعه في دفعة الترحيل
+    batch_reference = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='مرجع دفعة الترحيل'
+    )
+
     class Meta:
         permissions = [
             ("view_trial_balance", "يمكنه عرض ميزان المراجعة"),
         ]
+        indexes = [
+            models.Index(fields=['status', 'date'], name='entry_status_date_idx'),
+            models.Index(fields=['period', 'posted'], name='entry_period_posted_idx'),
+            models.Index(fields=['date', 'id'], name='entry_date_id_idx'),
+            models.Index(fields=['-created_at', '-id'], name='entry_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='entry_status_created_idx'),
+            models.Index(fields=['is_balanced', '-created_at', '-id'], name='entry_balanced_created_idx'),
+            models.Index(fields=['-total_debit'], name='entry_total_debit_idx'),
+        ]
 
     def clean(self):
-        if self.period and self.period.is_closed:
+        if periods.is_closed(self.period_id):
             raise ValidationError("لا يمكن إضافة أو تعديل قيد في فترة محاسبية مقفلة")
 
     def save(self, *args, **kwargs):
+        periods.assign_period(self, self.date)
         self.full_clean()
         super().save(*args, **kwargs)
 
@@ -251,6 +380,253 @@ class JournalEntryLine(models.Model):
         permissions = [
             ("view_general_ledger", "Can view general ledger"),
         ]
+        indexes = [
+            # فهرس مغطٍ: MySQL يجمع المدين والدائن لكل حساب من الفهرس دون قراءة الجدول
+            models.Index(
+                fields=['account', 'journal_entry', 'debit', 'credit'],
+                name='line_account_entry_amount_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account} | مدين: {self.debit} | دائن: {self.credit}"
+
+
+class AccountBalance(models.Model):
+    account = models.OneToOneField(
+        Account,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance',
+        verbose_name='الحساب'
+    )
+
+    debit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي المدين'
+    )
+
+    credit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي الدائن'
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.account} | مدين: {self.debit} | دائن: {self.credit}"
+
+
+class LedgerSnapshot(models.Model):
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name='الحساب'
+    )
+
+    period = models.ForeignKey(
+        AccountingPeriod,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name='الفترة المحاسبية'
+    )
+
+    # الأرصدة تراكمية حتى هذا التاريخ (شاملاً)
+    as_of = models.DateField(verbose_name='حتى تاريخ')
+
+    debit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي المدين'
+    )
+
+    credit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي الدائن'
+    )
+
+    class Meta:
+        ordering = ['account', 'as_of']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'period'],
+                name='unique_ledger_snapshot_per_period'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'as_of']),
+        ]
+
+    @property
+    def balance(self):
+        return self.debit - self.credit
+
+    def __str__(self):
+        return f"{self.account} حتى {self.as_of}"
+
+
+class AccountPeriodBalance(models.Model):
+    # رصيد كل حساب في كل فترة من القيود المعتمدة، بإشارة المدين موجبة
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='period_balances',
+        verbose_name='الحساب'
+    )
+
+    period = models.ForeignKey(
+        AccountingPeriod,
+        on_delete=models.CASCADE,
+        related_name='account_balances',
+        verbose_name='الفترة المحاسبية'
+    )
+
+    opening = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='الرصيد الافتتاحي')
+    debit = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='حركة المدين')
+    credit = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='حركة الدائن')
+    closing = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name='الرصيد الختامي')
+
+    # تُجمّد أرصدة الفترة عند إقفالها
+    is_frozen = models.BooleanField(default=False, verbose_name='مجمد')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'account'],
+                name='unique_account_period_balance'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'period'], name='period_balance_account_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.account} | {self.period}: {self.closing}"
+
+
+class PostingRule(models.Model):
+    invoice_type = models.CharField(
+        max_length=10,
+        choices=Invoice.INVOICE_TYPES,
+        unique=True,
+        verbose_name='نوع الفاتورة'
+    )
+
+    debit_account = models.ForeignKey(
+        Account,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='الحساب المدين'
+    )
+
+    credit_account = models.ForeignKey(
+        Account,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='الحساب الدائن'
+    )
+
+    def __str__(self):
+        return f"{self.get_invoice_type_display()}: {self.debit_account} / {self.credit_account}"
+
+
+class DailyAccountRollup(models.Model):
+    date = models.DateField(verbose_name='التاريخ')
+
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        verbose_name='الحساب'
+    )
+
+    debit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي المدين'
+    )
+
+    credit = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name='إجمالي الدائن'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'account'],
+                name='unique_daily_rollup'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.account}"
+
+
+class BackgroundJob(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('succeeded', 'مكتملة'),
+        ('failed', 'فشلت'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name='المهمة')
+    params = models.JSONField(default=dict, blank=True, verbose_name='المعاملات')
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='الحالة'
+    )
+
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='نسبة الإنجاز')
+    message = models.CharField(max_length=255, blank=True, verbose_name='آخر رسالة')
+    error = models.TextField(blank=True, verbose_name='الخطأ')
+
+    result = models.FileField(
+        upload_to='jobs/%Y/%m/',
+        blank=True,
+        verbose_name='ملف النتيجة'
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='background_jobs'
+    )
+
+    worker = models.CharField(max_length=100, blank=True, verbose_name='العامل')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # يحدّثه العامل دورياً أثناء التنفيذ، وتوقفه يعني أن العامل مات
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # العمال يلتقطون أقدم مهمة منتظرة
+            models.Index(fields=['status', 'created_at', 'id'], name='job_status_created_idx'),
+            models.Index(fields=['created_by', '-created_at'], name='job_user_created_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,66 @@
+from bisect import bisect_right
+
+from django.db import models
+
+from . import caching
+
+
+def _load_period_index():
+    # استيراد متأخر لأن models تستعمل هذه الوحدة في clean()
+    from .models import AccountingPeriod
+
+    periods = list(AccountingPeriod.objects.order_by('start_date'))
+    return (
+        [period.start_date for period in periods],
+        periods,
+        {period.pk: period for period in periods},
+    )
+
+
+def period_index():
+    # كل الفترات مرتبة حسب البداية في ذاكرة العملية،
+    # وتُبطل عند إنشاء فترة أو تعديلها أو إقفالها أو حذفها
+    return caching.cached('periods', _load_period_index)
+
+
+def all_periods():
+    return period_index()[1]
+
+
+def find_period(index, value):
+    starts, periods, _ = index
+    position = bisect_right(starts, value) - 1
+    if position >= 0 and value <= periods[position].end_date:
+        return periods[position]
+    return None
+
+
+def period_for_date(value):
+    # يقبل النص والتاريخ والوقت كما يقبلها حقل التاريخ قبل الحفظ
+    value = models.DateField().to_python(value)
+    if value is None:
+        return None
+    return find_period(period_index(), value)
+
+
+def get_period(period_id):
+    if period_id is None:
+        return None
+
+    period = period_index()[2].get(period_id)
+    if period is None:
+        # فترة أُنشئت في المعاملة الحالية ولم يُبطل الفهرس بعد
+        from .models import AccountingPeriod
+        period = AccountingPeriod.objects.filter(pk=period_id).first()
+    return period
+
+
+def is_closed(period_id):
+    period = get_period(period_id)
+    return bool(period and period.is_closed)
+
+
+def assign_period(instance, value):
+    # الفترة تُحدد من التاريخ ما لم يخترها المستخدم
+    if instance.period_id is None:
+        instance.period = period_for_date(value)
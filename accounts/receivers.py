@@ -0,0 +1,181 @@
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching
+from .backends import forget_user
+from .models import Account, AccountingPeriod, JournalEntry, JournalEntryLine, PostingRule, User
+from .services import (
+    ZERO,
+    apply_balance_deltas,
+    apply_entry_deltas,
+    carry_forward_period_balances,
+    link_account,
+    move_account,
+)
+from .signals import entries_approved
+
+
+# =========================
+# تحديث أرصدة الحسابات عند كتابة أسطر القيود
+# =========================
+@receiver(pre_save, sender=JournalEntryLine)
+def remember_previous_line(sender, instance, raw=False, **kwargs):
+    instance._previous_line = None
+    if instance.pk and not raw:
+        instance._previous_line = (
+            sender.objects
+            .filter(pk=instance.pk)
+            .values('journal_entry_id', 'account_id', 'debit', 'credit')
+            .first()
+        )
+
+
+@receiver(post_save, sender=JournalEntryLine)
+def update_balance_on_line_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    deltas = {instance.account_id: (instance.debit, instance.credit)}
+
+    previous = getattr(instance, '_previous_line', None)
+    if previous:
+        debit, credit = deltas.get(previous['account_id'], (ZERO, ZERO))
+        deltas[previous['account_id']] = (
+            debit - previous['debit'],
+            credit - previous['credit'],
+        )
+
+    apply_balance_deltas(deltas)
+
+
+@receiver(post_delete, sender=JournalEntryLine)
+def update_balance_on_line_delete(sender, instance, **kwargs):
+    apply_balance_deltas({
+        instance.account_id: (-instance.debit, -instance.credit)
+    })
+
+
+# =========================
+# تحديث مجاميع القيد عند كتابة أسطره
+# =========================
+@receiver(post_save, sender=JournalEntryLine)
+def update_entry_totals_on_line_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    deltas = {instance.journal_entry_id: (instance.debit, instance.credit)}
+
+    previous = getattr(instance, '_previous_line', None)
+    if previous:
+        debit, credit = deltas.get(previous['journal_entry_id'], (ZERO, ZERO))
+        deltas[previous['journal_entry_id']] = (
+            debit - previous['debit'],
+            credit - previous['credit'],
+        )
+
+    apply_entry_deltas(deltas)
+
+
+@receiver(post_delete, sender=JournalEntryLine)
+def update_entry_totals_on_line_delete(sender, instance, **kwargs):
+    apply_entry_deltas({
+        instance.journal_entry_id: (-instance.debit, -instance.credit)
+    })
+
+
+# =========================
+# إبطال ذاكرة حسابات الترحيل
+# =========================
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=PostingRule)
+@receiver(post_delete, sender=PostingRule)
+def invalidate_posting_accounts(sender, **kwargs):
+    caching.invalidate('posting_accounts')
+
+
+# =========================
+# إبطال ذاكرة دليل الحسابات
+# =========================
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def invalidate_chart_of_accounts(sender, **kwargs):
+    caching.invalidate('chart_of_accounts')
+
+
+# =========================
+# إبطال ذاكرة المستخدمين وصلاحياتهم
+# =========================
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # الدور وكلمة المرور وحالة التفعيل كلها على المستخدم نفسه
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions(sender, **kwargs):
+    caching.invalidate('permissions')
+
+
+# =========================
+# إبطال مؤشرات لوحة المدير المالي
+# =========================
+@receiver(entries_approved)
+@receiver(post_save, sender=JournalEntryLine)
+@receiver(post_delete, sender=JournalEntryLine)
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_delete, sender=JournalEntry)
+def invalidate_profit_and_loss(sender, **kwargs):
+    # التعديلات المباشرة من لوحة الإدارة تتجاوز مسار الاعتماد، ومنها تغيير حالة القيد
+    caching.invalidate('profit_and_loss')
+
+
+# =========================
+# مزامنة جدول الإغلاق لشجرة الحسابات
+# =========================
+@receiver(pre_save, sender=Account)
+def remember_previous_parent(sender, instance, raw=False, **kwargs):
+    instance._previous_parent_id = None
+    if instance.pk and not raw:
+        instance._previous_parent_id = (
+            sender.objects
+            .filter(pk=instance.pk)
+            .values_list('parent_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Account)
+def sync_account_closure(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        link_account(instance)
+    elif instance.parent_id != instance._previous_parent_id:
+        move_account(instance)
+
+
+# =========================
+# إبطال فهرس الفترات
+# =========================
+@receiver(post_save, sender=AccountingPeriod)
+@receiver(post_delete, sender=AccountingPeriod)
+def invalidate_periods(sender, **kwargs):
+    caching.invalidate('periods')
+
+
+# =========================
+# أرصدة الفترات الجديدة
+# =========================
+@receiver(post_save, sender=AccountingPeriod)
+def open_period_balances(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        carry_forward_period_balances(instance)
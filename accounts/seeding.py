@@ -0,0 +1,252 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import caching
+from .models import (
+    Account,
+    AccountingPeriod,
+    Invoice,
+    InvoiceItem,
+    JournalEntry,
+    JournalEntryLine,
+    PostingRule,
+    User,
+)
+from .services import (
+    DEFAULT_POSTING_TYPES,
+    POSTING_BATCH_SIZE,
+    ZERO,
+    apply_approved_lines,
+    post_journal_entries,
+    rebuild_account_closure,
+)
+
+
+SEED_PREFIX = 'SEED'
+
+# الحساب الرئيسي لكل نوع ونسبته التقريبية من دليل الحسابات
+CHART_SECTIONS = (
+    ('1', 'asset', 'الأصول', 0.3),
+    ('2', 'liability', 'الخصوم', 0.15),
+    ('3', 'equity', 'حقوق الملكية', 0.05),
+    ('4', 'revenue', 'الإيرادات', 0.2),
+    ('5', 'expense', 'المصروفات', 0.3),
+)
+TYPE_PREFIXES = {account_type: prefix for prefix, account_type, *_ in CHART_SECTIONS}
+
+# أنماط قيود شائعة: (نوع الطرف المدين، نوع الطرف الدائن)
+ENTRY_PATTERNS = (
+    ('asset', 'revenue'),
+    ('expense', 'asset'),
+    ('expense', 'liability'),
+    ('liability', 'asset'),
+    ('asset', 'asset'),
+    ('asset', 'equity'),
+)
+
+
+def seed_user():
+    user, _ = User.objects.get_or_create(
+        username='seed',
+        defaults={'role': 'accountant', 'first_name': 'بيانات تجريبية'}
+    )
+    return user
+
+
+def seed_chart_of_accounts(count):
+    # حساب رئيسي لكل نوع وتحته حسابات فرعية بالنسب أعلاه
+    existing = set(Account.objects.values_list('code', flat=True))
+
+    parents = []
+    for prefix, account_type, name, _ in CHART_SECTIONS:
+        code = f"{prefix}000"
+        if code not in existing:
+            parents.append(Account(code=code, name=name, account_type=account_type))
+    Account.objects.bulk_create(parents)
+    parent_ids = dict(
+        Account.objects
+        .filter(code__in=[f"{prefix}000" for prefix, *_ in CHART_SECTIONS])
+        .values_list('code', 'id')
+    )
+
+    children = []
+    for prefix, account_type, name, share in CHART_SECTIONS:
+        for number in range(1, max(int(count * share), 1) + 1):
+            code = f"{prefix}{number:03d}"
+            if code not in existing:
+                children.append(Account(
+                    code=code,
+                    name=f"{name} {number}",
+                    account_type=account_type,
+                    parent_id=parent_ids[f"{prefix}000"],
+                ))
+    Account.objects.bulk_create(children, batch_size=1000)
+
+    # قواعد ترحيل الفواتير على أول حساب فرعي من كل نوع بدلاً من الحساب الرئيسي
+    for invoice_type, (debit_type, credit_type) in DEFAULT_POSTING_TYPES.items():
+        PostingRule.objects.get_or_create(
+            invoice_type=invoice_type,
+            defaults={
+                'debit_account': Account.objects.get(code=f"{TYPE_PREFIXES[debit_type]}001"),
+                'credit_account': Account.objects.get(code=f"{TYPE_PREFIXES[credit_type]}001"),
+            }
+        )
+
+    # bulk_create لا يطلق الإشارات، فنعيد بناء جدول الشجرة ونبطل الذاكرة يدوياً
+    rebuild_account_closure()
+    caching.invalidate('posting_accounts')
+    caching.invalidate('chart_of_accounts')
+
+    return len(parents) + len(children)
+
+
+def seed_periods(year):
+    periods = []
+    for month in range(1, 13):
+        start = date(year, month, 1)
+        end = (date(year + (month == 12), month % 12 + 1, 1)) - timedelta(days=1)
+        periods.append(AccountingPeriod(name=f"{year}-{month:02d}", start_date=start, end_date=end))
+
+    existing = set(
+        AccountingPeriod.objects
+        .filter(start_date__year=year)
+        .values_list('start_date', flat=True)
+    )
+    AccountingPeriod.objects.bulk_create(
+        [period for period in periods if period.start_date not in existing]
+    )
+    caching.invalidate('periods')
+
+    return {
+        period.start_date.month: period
+        for period in AccountingPeriod.objects.filter(start_date__year=year, is_closed=False)
+    }
+
+
+def _leaf_accounts():
+    accounts = {}
+    for account_id, account_type in (
+        Account.objects
+        .filter(children__isnull=True)
+        .values_list('id', 'account_type')
+    ):
+        accounts.setdefault(account_type, []).append(account_id)
+    return accounts
+
+
+def _amount(rng):
+    return Decimal(rng.randint(1000, 500000)) / 100
+
+
+def seed_entries(count, year, approved_ratio=0.8, rng=None):
+    rng = rng or random.Random()
+    user = seed_user()
+    periods = seed_periods(year)
+    accounts = _leaf_accounts()
+    patterns = [
+        pattern for pattern in ENTRY_PATTERNS
+        if pattern[0] in accounts and pattern[1] in accounts
+    ]
+
+    created = 0
+    while created < count:
+        batch = []
+        for _ in range(min(POSTING_BATCH_SIZE, count - created)):
+            entry_date = date(year, 1, 1) + timedelta(days=rng.randrange(365))
+            approved = rng.random() < approved_ratio
+            entry = JournalEntry(
+                date=entry_date,
+                description=f"{SEED_PREFIX} قيد تجريبي",
+                period=periods.get(entry_date.month),
+                status='approved' if approved else 'draft',
+                posted=approved,
+                created_by=user,
+            )
+
+            # طرف مدين أو أكثر مقابل طرف دائن واحد
+            debit_type, credit_type = rng.choice(patterns)
+            amounts = [_amount(rng) for _ in range(rng.choice((1, 1, 1, 2, 3)))]
+            lines = [
+                JournalEntryLine(account_id=rng.choice(accounts[debit_type]), debit=amount, credit=ZERO)
+                for amount in amounts
+            ]
+            lines.append(JournalEntryLine(
+                account_id=rng.choice(accounts[credit_type]),
+                debit=ZERO,
+                credit=sum(amounts, ZERO),
+            ))
+            batch.append((entry, lines))
+
+        with transaction.atomic():
+            post_journal_entries(batch)
+            apply_approved_lines([
+                (entry, lines) for entry, lines in batch if entry.status == 'approved'
+            ])
+        created += len(batch)
+
+    return created
+
+
+def seed_invoices(count, year, rng=None):
+    rng = rng or random.Random()
+    user = seed_user()
+    periods = seed_periods(year)
+    offset = Invoice.objects.filter(invoice_number__startswith=f"{SEED_PREFIX}-").count()
+
+    created = 0
+    while created < count:
+        batch = []
+        for number in range(created, min(created + POSTING_BATCH_SIZE, count)):
+            invoice_date = date(year, 1, 1) + timedelta(days=rng.randrange(365))
+            items = [
+                InvoiceItem(
+                    description=f"صنف {rng.randint(1, 500)}",
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    total_price=quantity * unit_price,
+                )
+                for quantity, unit_price in (
+                    (rng.randint(1, 20), _amount(rng)) for _ in range(rng.randint(1, 4))
+                )
+            ]
+            invoice = Invoice(
+                invoice_number=f"{SEED_PREFIX}-{offset + number + 1:08d}",
+                invoice_type=rng.choice(('sale', 'purchase')),
+                customer_name=f"عميل {rng.randint(1, 300)}",
+                invoice_date=invoice_date,
+                period=periods.get(invoice_date.month),
+                total_amount=sum((item.total_price for item in items), ZERO),
+                created_by=user,
+            )
+            batch.append((invoice, items))
+
+        with transaction.atomic():
+            Invoice.objects.bulk_create([invoice for invoice, _ in batch])
+            # MySQL لا يعيد المعرفات من bulk_create، ورقم الفاتورة فريد
+            ids = dict(
+                Invoice.objects
+                .filter(invoice_number__in=[invoice.invoice_number for invoice, _ in batch])
+                .values_list('invoice_number', 'id')
+            )
+            all_items = []
+            for invoice, items in batch:
+                for item in items:
+                    item.invoice_id = ids[invoice.invoice_number]
+                    all_items.append(item)
+
+            InvoiceItem.objects.bulk_create(all_items, batch_size=1000)
+        created += len(batch)
+
+    return created
+
+
+def seed_ledger(accounts, entries, invoices, year, seed=None):
+    rng = random.Random(seed)
+    return {
+        'accounts': seed_chart_of_accounts(accounts),
+        'entries': seed_entries(entries, year, rng=rng),
+        'invoices': seed_invoices(invoices, year, rng=rng),
+    }
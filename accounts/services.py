@@ -1,10 +1,1321 @@
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core import signing
 from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import caching, periods
+from .signals import entries_approved
+from .models import (
+    Account,
+    AccountBalance,
+    AccountClosure,
+    AccountingPeriod,
+    AccountPeriodBalance,
+    DailyAccountRollup,
+    Invoice,
+    JournalEntry,
+    JournalEntryLine,
+    LedgerSnapshot,
+    PostingRule,
+)
+
+
+ZERO = Decimal('0.00')
+
+LEDGER_PAGE_SIZE = 200
+POSTING_BATCH_SIZE = 500
+PROFIT_AND_LOSS_CACHE_KEY = 'accounts:profit_and_loss'
+PROFIT_AND_LOSS_CACHE_TIMEOUT = 60 * 60
+LEDGER_CURSOR_SALT = 'accounts.general_ledger'
+INVOICE_PAGE_SIZE = 50
+INVOICE_CURSOR_SALT = 'accounts.invoice_list'
+
+
+# =========================
+# إقفال الفترة المحاسبية
+# =========================
+def retained_earnings_account():
+    code = getattr(settings, 'RETAINED_EARNINGS_ACCOUNT_CODE', None)
+    accounts = Account.objects.filter(account_type='equity')
+    if code:
+        accounts = accounts.filter(code=code)
+
+    account = accounts.order_by('code').first()
+    if account is None:
+        raise ValidationError("لا يوجد حساب حقوق ملكية لترحيل نتيجة الفترة إليه")
+    return account
+
+
+def closing_lines(totals, retained_earnings):
+    # تصفير أرصدة الإيرادات والمصروفات وترحيل الصافي إلى حقوق الملكية
+    income_accounts = set(
+        Account.objects
+        .filter(pk__in=totals, account_type__in=('revenue', 'expense'))
+        .values_list('pk', flat=True)
+    )
+
+    lines = []
+    net = ZERO
+    for account_id in sorted(income_accounts):
+        debit, credit = totals[account_id]
+        balance = debit - credit
+        if balance == 0:
+            continue
+
+        lines.append(JournalEntryLine(
+            account_id=account_id,
+            debit=-balance if balance < 0 else ZERO,
+            credit=balance if balance > 0 else ZERO,
+        ))
+        net += balance
+
+    if lines:
+        lines.append(JournalEntryLine(
+            account=retained_earnings,
+            debit=net if net > 0 else ZERO,
+            credit=-net if net < 0 else ZERO,
+        ))
+
+    return lines
+
+
+def close_accounting_period(period, user=None):
+    with transaction.atomic():
+        period = AccountingPeriod.objects.select_for_update().get(pk=period.pk)
+
+        if period.is_closed:
+            raise ValidationError("الفترة مقفلة مسبقاً")
+
+        # الإقفال بالترتيب، وإلا صفّر قيد فترة لاحقة إيرادات الفترة السابقة قبل إقفالها
+        if AccountingPeriod.objects.filter(start_date__lt=period.start_date, is_closed=False).exists():
+            raise ValidationError("لا يمكن إقفال الفترة قبل إقفال الفترات السابقة لها")
+
+        if period.journal_entries.filter(posted=False).exists():
+            raise ValidationError(
+                "لا يمكن إقفال الفترة، يوجد قيود غير مرحلة"
+            )
+
+        # أرصدة الإقفال لكل الحسابات باستعلام مجمع واحد بعد آخر لقطة
+        totals = ledger_totals_at(period)
+
+        lines = closing_lines(totals, retained_earnings_account())
+        if lines:
+            entry = JournalEntry(
+                date=period.end_date,
+                description=f"قيد إقفال الفترة {period.name}",
+                entry_type='closing',
+                status='approved',
+                posted=True,
+                period=period,
+                created_by=user,
+            )
+            post_journal_entries([(entry, lines)])
+            # قيد الإقفال لا يدخل التجميع اليومي لكنه جزء من أرصدة الفترة
+            apply_period_balance_deltas(period_balance_deltas([(entry, lines)]))
+
+            for account_id, (debit, credit) in line_deltas(lines).items():
+                previous_debit, previous_credit = totals.get(account_id, (ZERO, ZERO))
+                totals[account_id] = (previous_debit + debit, previous_credit + credit)
+
+        # أرصدة ما بعد الإقفال هي الأرصدة الافتتاحية للفترة التالية
+        write_ledger_snapshots(period, totals)
+
+        freeze_period_balances(period)
+
+        period.is_closed = True
+        period.closed_at = timezone.now()
+        period.closed_by = user
+        period.save()
+
+    return period
+
+
+# =========================
+# أرصدة الحسابات المجمعة
+# =========================
+def apply_balance_deltas(deltas):
+    # deltas: {account_id: (debit, credit)}
+    deltas = {
+        account_id: (debit, credit)
+        for account_id, (debit, credit) in deltas.items()
+        if debit or credit
+    }
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        AccountBalance.objects.bulk_create(
+            [AccountBalance(account_id=account_id) for account_id in deltas],
+            ignore_conflicts=True
+        )
+        for account_id, (debit, credit) in deltas.items():
+            AccountBalance.objects.filter(account_id=account_id).update(
+                debit=F('debit') + debit,
+                credit=F('credit') + credit
+            )
+
+
+def line_deltas(lines, sign=1):
+    deltas = defaultdict(lambda: (ZERO, ZERO))
+    for line in lines:
+        debit, credit = deltas[line.account_id]
+        deltas[line.account_id] = (
+            debit + sign * Decimal(line.debit or 0),
+            credit + sign * Decimal(line.credit or 0),
+        )
+    return dict(deltas)
+
+
+def rebuild_account_balances():
+    totals = (
+        JournalEntryLine.objects
+        .values('account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        AccountBalance.objects.all().delete()
+        AccountBalance.objects.bulk_create(
+            [
+                AccountBalance(
+                    account_id=row['account_id'],
+                    debit=row['total_debit'] or ZERO,
+                    credit=row['total_credit'] or ZERO,
+                )
+                for row in totals
+            ],
+            batch_size=1000
+        )
+
+
+# =========================
+# مجاميع القيود
+# =========================
+IS_BALANCED = Case(
+    When(total_debit=F('total_credit'), then=Value(True)),
+    default=Value(False),
+    output_field=models.BooleanField()
+)
+
+
+def set_entry_totals(entry, lines):
+    entry.total_debit = sum((Decimal(line.debit or 0) for line in lines), ZERO)
+    entry.total_credit = sum((Decimal(line.credit or 0) for line in lines), ZERO)
+    entry.is_balanced = entry.total_debit == entry.total_credit
+
+
+def entry_deltas(lines, sign=1):
+    deltas = defaultdict(lambda: (ZERO, ZERO))
+    for line in lines:
+        debit, credit = deltas[line.journal_entry_id]
+        deltas[line.journal_entry_id] = (
+            debit + sign * Decimal(line.debit or 0),
+            credit + sign * Decimal(line.credit or 0),
+        )
+    return dict(deltas)
+
+
+def apply_entry_deltas(deltas):
+    # deltas: {entry_id: (debit, credit)}
+    deltas = {
+        entry_id: (debit, credit)
+        for entry_id, (debit, credit) in deltas.items()
+        if debit or credit
+    }
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for entry_id, (debit, credit) in deltas.items():
+            JournalEntry.objects.filter(pk=entry_id).update(
+                total_debit=F('total_debit') + debit,
+                total_credit=F('total_credit') + credit
+            )
+        # في تحديث منفصل: MySQL يقيّم SET بالترتيب فقد يقارن قيمة محدّثة بأخرى قديمة
+        JournalEntry.objects.filter(pk__in=deltas).update(is_balanced=IS_BALANCED)
+
+
+def entry_totals_drift(entry_ids):
+    # القيود التي تختلف مجاميعها المخزنة عن مجموع أسطرها الفعلي
+    totals = {
+        row['journal_entry_id']: (row['debit'] or ZERO, row['credit'] or ZERO)
+        for row in (
+            JournalEntryLine.objects
+            .filter(journal_entry_id__in=entry_ids)
+            .values('journal_entry_id')
+            .annotate(debit=Sum('debit'), credit=Sum('credit'))
+            .order_by()
+        )
+    }
+
+    drifted = []
+    stored = JournalEntry.objects.filter(id__in=entry_ids).values_list(
+        'id', 'total_debit', 'total_credit', 'is_balanced'
+    )
+    for entry_id, total_debit, total_credit, is_balanced in stored:
+        debit, credit = totals.get(entry_id, (ZERO, ZERO))
+        if (total_debit, total_credit, is_balanced) != (debit, credit, debit == credit):
+            drifted.append(JournalEntry(
+                id=entry_id,
+                total_debit=debit,
+                total_credit=credit,
+                is_balanced=debit == credit,
+            ))
+    return drifted
+
+
+# =========================
+# ترحيل القيود دفعة واحدة
+# =========================
+def validate_journal_entries(batch):
+    # التحقق في الذاكرة قبل أي كتابة في قاعدة البيانات
+    errors = []
+    for index, (entry, lines) in enumerate(batch, start=1):
+        prefix = f"القيد رقم {index}: " if len(batch) > 1 else ""
+
+        periods.assign_period(entry, entry.date)
+        if periods.is_closed(entry.period_id):
+            errors.append(prefix + "لا يمكن إضافة أو تعديل قيد في فترة محاسبية مقفلة")
+
+        if not lines:
+            errors.append(prefix + "القيد لا يحتوي على أسطر")
+            continue
+
+        total_debit = sum((Decimal(line.debit or 0) for line in lines), ZERO)
+        total_credit = sum((Decimal(line.credit or 0) for line in lines), ZERO)
+
+        if total_debit != total_credit:
+            errors.append(
+                prefix + f"القيد غير متوازن: مدين {total_debit} ≠ دائن {total_credit}"
+            )
+
+    if errors:
+        raise ValidationError(errors)
+
+
+def lock_closed_periods(period_ids):
+    # فهرس الفترات المخزن للتحقق المبكر فقط، والمرجع داخل معاملة الكتابة قاعدة البيانات
+    # والقفل يمنع إقفال الفترة حتى تنتهي الكتابة فيها
+    return {
+        period_id
+        for period_id, is_closed in (
+            AccountingPeriod.objects
+            .select_for_update()
+            .filter(pk__in={period_id for period_id in period_ids if period_id})
+            .order_by('pk')
+            .values_list('pk', 'is_closed')
+        )
+        if is_closed
+    }
+
+
+def _insert_entries(entries, batch_size):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return JournalEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+    # MySQL لا يعيد المعرفات من bulk_create، فلكل قيد مرجع فريد في الدفعة
+    # كما يُستخدم رقم الفاتورة في الاستيراد، ثم تُقرأ المعرفات باستعلام واحد
+    marker = uuid4().hex
+    for index, entry in enumerate(entries):
+        entry.batch_reference = f"{marker}:{index}"
+    JournalEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+    ids = dict(
+        JournalEntry.objects
+        .filter(batch_reference__startswith=f"{marker}:")
+        .values_list('batch_reference', 'id')
+    )
+    for entry in entries:
+        entry.pk = ids[entry.batch_reference]
+    return entries
+
 
-def close_accounting_period(period):
-    if period.journal_entries.filter(posted=False).exists():
-        raise ValidationError(
-            "لا يمكن إقفال الفترة، يوجد قيود غير مرحلة"
+def post_journal_entries(batch, batch_size=POSTING_BATCH_SIZE):
+    # batch: [(JournalEntry, [JournalEntryLine, ...]), ...] غير محفوظة
+    batch = [(entry, list(lines)) for entry, lines in batch]
+    validate_journal_entries(batch)
+
+    for entry, lines in batch:
+        set_entry_totals(entry, lines)
+
+    with transaction.atomic():
+        if lock_closed_periods(entry.period_id for entry, _ in batch):
+            raise ValidationError("لا يمكن إضافة أو تعديل قيد في فترة محاسبية مقفلة")
+
+        entries = _insert_entries([entry for entry, _ in batch], batch_size)
+
+        all_lines = []
+        for entry, lines in batch:
+            for line in lines:
+                line.journal_entry = entry
+                all_lines.append(line)
+
+        JournalEntryLine.objects.bulk_create(all_lines, batch_size=batch_size)
+        apply_balance_deltas(line_deltas(all_lines))
+
+    return entries
+
+
+# =========================
+# التجميع اليومي للقيود المعتمدة
+# =========================
+def apply_rollup_deltas(deltas):
+    # deltas: {(date, account_id): (debit, credit)}
+    deltas = {
+        key: (debit, credit)
+        for key, (debit, credit) in deltas.items()
+        if debit or credit
+    }
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        DailyAccountRollup.objects.bulk_create(
+            [
+                DailyAccountRollup(date=entry_date, account_id=account_id)
+                for entry_date, account_id in deltas
+            ],
+            ignore_conflicts=True
+        )
+        for (entry_date, account_id), (debit, credit) in deltas.items():
+            DailyAccountRollup.objects.filter(
+                date=entry_date,
+                account_id=account_id
+            ).update(
+                debit=F('debit') + debit,
+                credit=F('credit') + credit
+            )
+
+
+def rollup_deltas(dated_lines):
+    # dated_lines: [(date, line), ...]
+    deltas = defaultdict(lambda: (ZERO, ZERO))
+    for entry_date, line in dated_lines:
+        debit, credit = deltas[(entry_date, line.account_id)]
+        deltas[(entry_date, line.account_id)] = (
+            debit + Decimal(line.debit or 0),
+            credit + Decimal(line.credit or 0),
+        )
+    return dict(deltas)
+
+
+def rebuild_daily_rollups():
+    totals = (
+        JournalEntryLine.objects
+        .filter(journal_entry__status='approved')
+        .exclude(journal_entry__entry_type='closing')
+        .values('journal_entry__date', 'account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailyAccountRollup.objects.all().delete()
+        DailyAccountRollup.objects.bulk_create(
+            (
+                DailyAccountRollup(
+                    date=row['journal_entry__date'],
+                    account_id=row['account_id'],
+                    debit=row['total_debit'] or ZERO,
+                    credit=row['total_credit'] or ZERO,
+                )
+                for row in totals.iterator()
+            ),
+            batch_size=1000
+        )
+
+
+def monthly_profit_and_loss(months=12, today=None):
+    today = today or timezone.localdate()
+
+    # أول يوم في الشهر الأقدم ضمن السلسلة
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    start = date(month_index // 12, month_index % 12 + 1, 1)
+
+    totals = (
+        DailyAccountRollup.objects
+        .filter(
+            date__gte=start,
+            date__lte=today,
+            account__account_type__in=('revenue', 'expense')
+        )
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'account__account_type')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+
+    by_month = defaultdict(lambda: {'income': ZERO, 'expense': ZERO})
+    for row in totals:
+        month = row['month']
+        if row['account__account_type'] == 'revenue':
+            by_month[month]['income'] += row['total_credit'] or ZERO
+        else:
+            by_month[month]['expense'] += row['total_debit'] or ZERO
+
+    series = []
+    previous_profit = None
+    for offset in range(months):
+        index = month_index + offset
+        month = date(index // 12, index % 12 + 1, 1)
+        income = by_month[month]['income']
+        expense = by_month[month]['expense']
+        profit = income - expense
+
+        change = None
+        if previous_profit:
+            change = (profit - previous_profit) / abs(previous_profit) * 100
+
+        series.append({
+            'month': month,
+            'income': income,
+            'expense': expense,
+            'profit': profit,
+            'change': change,
+        })
+        previous_profit = profit
+
+    return series
+
+
+# =========================
+# أرصدة الحسابات لكل فترة
+# =========================
+def period_balance_deltas(batch):
+    # batch: [(JournalEntry, [JournalEntryLine, ...]), ...]
+    # القيود بلا فترة لا تدخل في أرصدة الفترات
+    deltas = defaultdict(lambda: (ZERO, ZERO))
+    for entry, lines in batch:
+        if not entry.period_id:
+            continue
+        for line in lines:
+            debit, credit = deltas[(entry.period_id, line.account_id)]
+            deltas[(entry.period_id, line.account_id)] = (
+                debit + Decimal(line.debit or 0),
+                credit + Decimal(line.credit or 0),
+            )
+    return dict(deltas)
+
+
+def apply_period_balance_deltas(deltas):
+    # deltas: {(period_id, account_id): (debit, credit)}
+    deltas = {
+        key: (debit, credit)
+        for key, (debit, credit) in deltas.items()
+        if debit or credit
+    }
+    if not deltas:
+        return
+
+    periods = list(AccountingPeriod.objects.order_by('start_date', 'id'))
+    starts = {period.pk: period.start_date for period in periods}
+
+    with transaction.atomic():
+        # لكل حساب صف في كل فترة منذ أول حركة له، فإن غاب صف الفترة
+        # فلا رصيد سابق له، وتُنشأ صفوفه في هذه الفترة وما بعدها بأصفار
+        existing = set(
+            AccountPeriodBalance.objects
+            .filter(account_id__in={account_id for _, account_id in deltas})
+            .values_list('period_id', 'account_id')
         )
+        missing = {
+            (period.pk, account_id)
+            for period_id, account_id in deltas
+            if (period_id, account_id) not in existing
+            for period in periods
+            if period.start_date >= starts[period_id]
+        } - existing
+        AccountPeriodBalance.objects.bulk_create(
+            [
+                AccountPeriodBalance(period_id=period_id, account_id=account_id)
+                for period_id, account_id in missing
+            ],
+            ignore_conflicts=True
+        )
+
+        for (period_id, account_id), (debit, credit) in deltas.items():
+            net = debit - credit
+            AccountPeriodBalance.objects.filter(
+                period_id=period_id,
+                account_id=account_id
+            ).update(
+                debit=F('debit') + debit,
+                credit=F('credit') + credit,
+                closing=F('closing') + net
+            )
+            # الفترات اللاحقة المفتوحة تفتتح بالرصيد الجديد
+            AccountPeriodBalance.objects.filter(
+                account_id=account_id,
+                period__start_date__gt=starts[period_id],
+                is_frozen=False
+            ).update(
+                opening=F('opening') + net,
+                closing=F('closing') + net
+            )
+
+
+def apply_approved_lines(batch):
+    # كل ما يُحدّث عند اعتماد قيود: التجميع اليومي وأرصدة الفترات
+    apply_rollup_deltas(rollup_deltas(
+        (entry.date, line) for entry, lines in batch for line in lines
+    ))
+    apply_period_balance_deltas(period_balance_deltas(batch))
+
+
+def carry_forward_period_balances(period):
+    # فترة جديدة تفتتح بأرصدة الفترة التي تسبقها مباشرة
+    previous = (
+        AccountingPeriod.objects
+        .filter(start_date__lt=period.start_date)
+        .order_by('-start_date')
+        .first()
+    )
+    if previous is None:
+        return
+
+    AccountPeriodBalance.objects.bulk_create(
+        [
+            AccountPeriodBalance(
+                period=period,
+                account_id=account_id,
+                opening=closing,
+                closing=closing,
+            )
+            for account_id, closing in previous.account_balances.values_list('account_id', 'closing')
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def freeze_period_balances(period):
+    AccountPeriodBalance.objects.filter(period=period).update(is_frozen=True)
+
+
+def expected_period_balances():
+    # الأرصدة كما تُحسب من أسطر القيود المعتمدة مباشرة
+    periods = list(AccountingPeriod.objects.order_by('start_date', 'id'))
+
+    movements = defaultdict(dict)
+    rows = (
+        JournalEntryLine.objects
+        .filter(journal_entry__status='approved', journal_entry__period__isnull=False)
+        .values('journal_entry__period_id', 'account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+    for row in rows:
+        movements[row['account_id']][row['journal_entry__period_id']] = (
+            row['total_debit'] or ZERO,
+            row['total_credit'] or ZERO,
+        )
+
+    expected = {}
+    for account_id, by_period in movements.items():
+        balance = None
+        for period in periods:
+            if balance is None and period.pk not in by_period:
+                continue
+            opening = balance or ZERO
+            debit, credit = by_period.get(period.pk, (ZERO, ZERO))
+            balance = opening + debit - credit
+            expected[(period.pk, account_id)] = (opening, debit, credit, balance)
+
+    return expected, {period.pk: period.is_closed for period in periods}
+
+
+def rebuild_period_balances():
+    expected, closed = expected_period_balances()
+
+    with transaction.atomic():
+        AccountPeriodBalance.objects.all().delete()
+        AccountPeriodBalance.objects.bulk_create(
+            [
+                AccountPeriodBalance(
+                    period_id=period_id,
+                    account_id=account_id,
+                    opening=opening,
+                    debit=debit,
+                    credit=credit,
+                    closing=closing,
+                    is_frozen=closed[period_id],
+                )
+                for (period_id, account_id), (opening, debit, credit, closing) in expected.items()
+            ],
+            batch_size=1000
+        )
+
+
+def period_trial_balance(period):
+    # صف واحد لكل حساب في الفترة بدلاً من جمع أسطر القيود
+    rows = (
+        period.account_balances
+        .select_related('account')
+        .order_by('account__code')
+    )
+
+    totals = {'opening': ZERO, 'debit': ZERO, 'credit': ZERO, 'closing': ZERO}
+    result = []
+    for row in rows:
+        if not (row.opening or row.debit or row.credit or row.closing):
+            continue
+        result.append(row)
+        for field in totals:
+            totals[field] += getattr(row, field)
+
+    return {'rows': result, 'totals': totals}
+
+
+# =========================
+# اعتماد القيود
+# =========================
+def notify_entries_approved(entries):
+    entries = list(entries)
+    transaction.on_commit(
+        lambda: entries_approved.send(sender=JournalEntry, entries=entries)
+    )
+
+
+def approve_journal_entry(entry):
+    with transaction.atomic():
+        # القفل يمنع طلبين متزامنين من ترحيل أسطر القيد نفسه مرتين
+        entry = JournalEntry.objects.select_for_update().get(pk=entry.pk)
+        if entry.status == 'approved':
+            return False
+
+        # منع اعتماد قيد في فترة مقفلة
+        if lock_closed_periods([entry.period_id]):
+            raise ValidationError("لا يمكن اعتماد قيد في فترة محاسبية مقفلة")
+
+        if not entry.is_balanced:
+            raise ValidationError(
+                f"لا يمكن اعتماد قيد غير متوازن: مدين {entry.total_debit} ≠ دائن {entry.total_credit}"
+            )
+
+        entry.status = 'approved'
+        entry.posted = True
+        entry.save(update_fields=['status', 'posted'])
+
+        apply_approved_lines([(entry, list(entry.lines.all()))])
+
+        notify_entries_approved([entry])
+
+    return True
+
+
+# =========================
+# اعتماد الفواتير
+# =========================
+# عند غياب قاعدة ترحيل نستخدم أول حساب من النوع المناسب حسب الرمز
+DEFAULT_POSTING_TYPES = {
+    'sale': ('asset', 'revenue'),
+    'purchase': ('expense', 'liability'),
+}
+
+
+def _load_posting_accounts():
+    accounts = {
+        rule.invoice_type: (rule.debit_account_id, rule.credit_account_id)
+        for rule in PostingRule.objects.all()
+    }
+
+    for invoice_type, (debit_type, credit_type) in DEFAULT_POSTING_TYPES.items():
+        if invoice_type not in accounts:
+            accounts[invoice_type] = (
+                Account.objects.filter(account_type=debit_type)
+                .order_by('code').values_list('id', flat=True).first(),
+                Account.objects.filter(account_type=credit_type)
+                .order_by('code').values_list('id', flat=True).first(),
+            )
+
+    return accounts
+
+
+def invoice_posting_accounts():
+    # {نوع الفاتورة: (معرف الحساب المدين، معرف الحساب الدائن)}
+    return caching.cached('posting_accounts', _load_posting_accounts)
+
+
+def approve_invoices(invoices, user):
+    # تُرجع (الفواتير المعتمدة، [(فاتورة، سبب التخطي)])
+    with transaction.atomic():
+        invoices = list(
+            Invoice.objects
+            .select_for_update()
+            .select_related('period')
+            .filter(pk__in=[invoice.pk for invoice in invoices], is_approved=False)
+            .order_by('pk')
+        )
+
+        # الحسابات تُجلب مرة واحدة لكل الدفعة
+        posting_accounts = invoice_posting_accounts()
+        closed = lock_closed_periods(invoice.period_id for invoice in invoices)
+
+        approved = []
+        skipped = []
+        batch = []
+
+        for invoice in invoices:
+            if invoice.period_id in closed:
+                skipped.append((invoice, "لا يمكن اعتماد فاتورة في فترة محاسبية مقفلة"))
+                continue
+
+            debit_account_id, credit_account_id = posting_accounts[invoice.invoice_type]
+            if not debit_account_id or not credit_account_id:
+                raise ValidationError("الحسابات المحاسبية غير مكتملة")
+
+            entry = JournalEntry(
+                date=invoice.invoice_date,
+                description=f"قيد تلقائي للفاتورة {invoice.invoice_number}",
+                created_by=user,
+                status='approved',
+                posted=True,
+                entry_type='invoice',
+                invoice=invoice,
+                period_id=invoice.period_id
+            )
+            lines = [
+                JournalEntryLine(
+                    account_id=debit_account_id,
+                    debit=invoice.total_amount,
+                    credit=ZERO
+                ),
+                JournalEntryLine(
+                    account_id=credit_account_id,
+                    debit=ZERO,
+                    credit=invoice.total_amount
+                ),
+            ]
+
+            batch.append((entry, lines))
+            approved.append(invoice)
+
+        if batch:
+            entries = post_journal_entries(batch)
+            apply_approved_lines(batch)
+            notify_entries_approved(entries)
+            Invoice.objects.filter(pk__in=[invoice.pk for invoice in approved]).update(
+                is_approved=True
+            )
+            for invoice in approved:
+                invoice.is_approved = True
+
+    return approved, skipped
+
+
+# =========================
+# قراءة التواريخ من الطلبات
+# =========================
+def safe_date(value):
+    # تاريخ بصيغة صحيحة لكنه غير موجود مثل 2026-13-45 يرفع ValueError من parse_date
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+# =========================
+# قائمة الفواتير
+# =========================
+INVOICE_FILTERS = ('status', 'invoice_type', 'date_from', 'date_to', 'period', 'customer', 'q')
+
+
+def filter_invoices(status=None, invoice_type=None, date_from=None, date_to=None,
+                    period=None, customer=None, q=None):
+    # المعاملات نصوص كما تأتي من الطلب أو من معاملات المهام الخلفية
+    invoices = Invoice.objects.all()
+
+    if status == 'approved':
+        invoices = invoices.filter(is_approved=True)
+    elif status == 'pending':
+        invoices = invoices.filter(is_approved=False)
+
+    if invoice_type:
+        invoices = invoices.filter(invoice_type=invoice_type)
+
+    date_from = safe_date(date_from)
+    date_to = safe_date(date_to)
+    if date_from:
+        invoices = invoices.filter(invoice_date__gte=date_from)
+    if date_to:
+        invoices = invoices.filter(invoice_date__lte=date_to)
+
+    if period and str(period).isdigit():
+        invoices = invoices.filter(period_id=int(period))
+
+    if customer:
+        invoices = invoices.filter(customer_name=customer)
+
+    if q:
+        # بحث بالبادئة فقط: istartswith في MySQL يصبح LIKE 'abc%' فيستخدم الفهرس،
+        # بينما icontains يصبح LIKE '%abc%' ويمسح الجدول كاملاً
+        q = q.strip()
+        invoices = invoices.filter(
+            Q(invoice_number__istartswith=q) | Q(customer_name__istartswith=q)
+        )
+
+    return invoices
+
+
+def encode_invoice_cursor(invoice):
+    return signing.dumps(
+        {'created_at': invoice.created_at.isoformat(), 'id': invoice.pk},
+        salt=INVOICE_CURSOR_SALT
+    )
+
+
+def decode_invoice_cursor(cursor):
+    try:
+        data = signing.loads(cursor, salt=INVOICE_CURSOR_SALT)
+        return {'created_at': datetime.fromisoformat(data['created_at']), 'id': data['id']}
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def invoice_page(invoices, cursor=None, page_size=INVOICE_PAGE_SIZE):
+    invoices = (
+        invoices
+        .select_related('created_by', 'period')
+        .order_by('-created_at', '-id')
+    )
+
+    position = decode_invoice_cursor(cursor) if cursor else None
+    if position:
+        invoices = invoices.filter(
+            Q(created_at__lt=position['created_at']) |
+            Q(created_at=position['created_at'], id__lt=position['id'])
+        )
+
+    rows = list(invoices[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    return {
+        'invoices': rows,
+        'next_cursor': encode_invoice_cursor(rows[-1]) if has_next else None,
+        'is_first_page': position is None,
+    }
+
+
+# =========================
+# ميزان المراجعة
+# =========================
+def trial_balance_accounts(materialized=None):
+    if materialized is None:
+        materialized = getattr(settings, 'ACCOUNTS_MATERIALIZED_BALANCES', False)
+
+    # استعلام واحد مجمع بدلاً من استعلامين لكل حساب
+    if materialized:
+        accounts = Account.objects.annotate(
+            total_debit=Coalesce('balance__debit', Value(ZERO)),
+            total_credit=Coalesce('balance__credit', Value(ZERO)),
+        )
+    else:
+        accounts = Account.objects.annotate(
+            total_debit=Coalesce(Sum('journalentryline__debit'), Value(ZERO)),
+            total_credit=Coalesce(Sum('journalentryline__credit'), Value(ZERO)),
+        )
+
+    return accounts.order_by('code')
+
+
+def trial_balance(materialized=None):
+    rows = []
+    total_debit = ZERO
+    total_credit = ZERO
+
+    for account in trial_balance_accounts(materialized):
+        if account.total_debit != 0 or account.total_credit != 0:
+            rows.append({
+                'account': account,
+                'debit': account.total_debit,
+                'credit': account.total_credit,
+            })
+            total_debit += account.total_debit
+            total_credit += account.total_credit
+
+    return {
+        'rows': rows,
+        'total_debit': total_debit,
+        'total_credit': total_credit,
+    }
+
+
+# =========================
+# دليل الحسابات في الذاكرة
+# =========================
+def _load_chart_of_accounts():
+    accounts = {account.pk: account for account in Account.objects.order_by('code')}
+    choices = [(pk, str(account)) for pk, account in accounts.items()]
+    return accounts, choices
+
+
+def chart_of_accounts():
+    # {المعرف: الحساب} مرتباً حسب الرمز، ويُبطل عند حفظ أي حساب أو حذفه
+    return caching.cached('chart_of_accounts', _load_chart_of_accounts)[0]
+
+
+def account_choices():
+    # قائمة (المعرف، الرمز - الاسم) جاهزة لحقول الاختيار
+    return caching.cached('chart_of_accounts', _load_chart_of_accounts)[1]
+
+
+# =========================
+# شجرة الحسابات
+# =========================
+def rebuild_account_closure():
+    parents = dict(Account.objects.values_list('id', 'parent_id'))
+
+    rows = []
+    for account_id in parents:
+        node, depth = account_id, 0
+        while node is not None:
+            rows.append(AccountClosure(ancestor_id=node, descendant_id=account_id, depth=depth))
+            node, depth = parents.get(node), depth + 1
+
+    with transaction.atomic():
+        AccountClosure.objects.all().delete()
+        AccountClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+def link_account(account):
+    links = [AccountClosure(ancestor_id=account.pk, descendant_id=account.pk, depth=0)]
+
+    if account.parent_id:
+        links += [
+            AccountClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=account.pk,
+                depth=depth + 1
+            )
+            for ancestor_id, depth in AccountClosure.objects
+            .filter(descendant_id=account.parent_id)
+            .values_list('ancestor_id', 'depth')
+        ]
+
+    AccountClosure.objects.bulk_create(links)
+
+
+def move_account(account):
+    subtree = list(
+        AccountClosure.objects
+        .filter(ancestor_id=account.pk)
+        .values_list('descendant_id', 'depth')
+    )
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+    with transaction.atomic():
+        # فصل الفرع عن آبائه القدامى ثم ربطه بآباء الأب الجديد
+        (
+            AccountClosure.objects
+            .filter(descendant_id__in=subtree_ids)
+            .exclude(ancestor_id__in=subtree_ids)
+            .delete()
+        )
+
+        if account.parent_id:
+            ancestors = (
+                AccountClosure.objects
+                .filter(descendant_id=account.parent_id)
+                .values_list('ancestor_id', 'depth')
+            )
+            AccountClosure.objects.bulk_create(
+                [
+                    AccountClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        depth=ancestor_depth + descendant_depth + 1
+                    )
+                    for ancestor_id, ancestor_depth in ancestors
+                    for descendant_id, descendant_depth in subtree
+                ],
+                batch_size=1000
+            )
+
+
+def tree_order(accounts):
+    # ترتيب الحسابات كشجرة (الأب ثم فروعه) مع عمق كل حساب
+    children = defaultdict(list)
+    ids = {account.pk for account in accounts}
+    for account in sorted(accounts, key=lambda a: a.code):
+        parent_id = account.parent_id if account.parent_id in ids else None
+        children[parent_id].append(account)
+
+    ordered = []
+    stack = [(account, 0) for account in reversed(children[None])]
+    while stack:
+        account, depth = stack.pop()
+        account.depth = depth
+        ordered.append(account)
+        stack.extend((child, depth + 1) for child in reversed(children[account.pk]))
+
+    return ordered
+
+
+def consolidated_accounts(materialized=None):
+    if materialized is None:
+        materialized = getattr(settings, 'ACCOUNTS_MATERIALIZED_BALANCES', False)
+
+    # استعلام واحد: كل حساب مع مجموع أرصدة فروعه عبر جدول الإغلاق مهما كان عمق الشجرة
+    if materialized:
+        debit = Sum('descendant_links__descendant__balance__debit')
+        credit = Sum('descendant_links__descendant__balance__credit')
+    else:
+        debit = Sum('descendant_links__descendant__journalentryline__debit')
+        credit = Sum('descendant_links__descendant__journalentryline__credit')
+
+    accounts = Account.objects.annotate(
+        total_debit=Coalesce(debit, Value(ZERO)),
+        total_credit=Coalesce(credit, Value(ZERO)),
+    )
+
+    return tree_order(list(accounts))
+
+
+def consolidated_trial_balance(materialized=None):
+    rows = []
+    total_debit = ZERO
+    total_credit = ZERO
+
+    for account in consolidated_accounts(materialized):
+        if account.total_debit == 0 and account.total_credit == 0:
+            continue
+
+        rows.append({
+            'account': account,
+            'depth': account.depth,
+            'debit': account.total_debit,
+            'credit': account.total_credit,
+        })
+
+        # الإجمالي من الحسابات الرئيسية فقط حتى لا تُحتسب الفروع مرتين
+        if account.depth == 0:
+            total_debit += account.total_debit
+            total_credit += account.total_credit
+
+    return {
+        'rows': rows,
+        'total_debit': total_debit,
+        'total_credit': total_credit,
+    }
+
+
+# =========================
+# الإيرادات والمصروفات
+# =========================
+def profit_and_loss():
+    income = (
+        JournalEntryLine.objects
+        .filter(
+            account__account_type='revenue',
+            journal_entry__status='approved'
+        )
+        .exclude(journal_entry__entry_type='closing')
+        .aggregate(total=Sum('credit'))['total'] or 0
+    )
+
+    expense = (
+        JournalEntryLine.objects
+        .filter(
+            account__account_type='expense',
+            journal_entry__status='approved'
+        )
+        .exclude(journal_entry__entry_type='closing')
+        .aggregate(total=Sum('debit'))['total'] or 0
+    )
+
+    return {
+        'income': income,
+        'expense': expense,
+        'profit': income - expense,
+    }
+
+
+def cached_profit_and_loss():
+    # المفتاح يحمل إصداراً يُرفع بعد التزام أي تغيير في القيود، فقارئ حسب الأرقام
+    # قبل الالتزام وكتبها بعده يكتبها تحت إصدار لم يعد أحد يقرؤه
+    key = f"{PROFIT_AND_LOSS_CACHE_KEY}:{caching.get_version('profit_and_loss')}"
+    return cache.get_or_set(key, profit_and_loss, timeout=PROFIT_AND_LOSS_CACHE_TIMEOUT)
+
+
+# =========================
+# لقطات أرصدة دفتر الأستاذ
+# =========================
+def ledger_totals_at(period):
+    # نبدأ من لقطات آخر فترة سابقة بدلاً من إعادة مسح الدفتر كاملاً
+    previous = (
+        AccountingPeriod.objects
+        .filter(end_date__lt=period.start_date, snapshots__isnull=False)
+        .order_by('-end_date')
+        .first()
+    )
+
+    totals = {}
+    lines = JournalEntryLine.objects.filter(
+        journal_entry__status='approved',
+        journal_entry__date__lte=period.end_date
+    )
+
+    if previous:
+        for snapshot in previous.snapshots.all():
+            totals[snapshot.account_id] = (snapshot.debit, snapshot.credit)
+        lines = lines.filter(journal_entry__date__gt=previous.end_date)
+
+    movements = (
+        lines
+        .values('account_id')
+        .annotate(total_debit=Sum('debit'), total_credit=Sum('credit'))
+        .order_by()
+    )
+    for row in movements:
+        debit, credit = totals.get(row['account_id'], (ZERO, ZERO))
+        totals[row['account_id']] = (
+            debit + (row['total_debit'] or ZERO),
+            credit + (row['total_credit'] or ZERO),
+        )
+
+    return totals
+
+
+def write_ledger_snapshots(period, totals):
+    with transaction.atomic():
+        period.snapshots.all().delete()
+        LedgerSnapshot.objects.bulk_create(
+            [
+                LedgerSnapshot(
+                    account_id=account_id,
+                    period=period,
+                    as_of=period.end_date,
+                    debit=debit,
+                    credit=credit,
+                )
+                for account_id, (debit, credit) in totals.items()
+            ],
+            batch_size=1000
+        )
+
+
+def rebuild_ledger_snapshots(period):
+    write_ledger_snapshots(period, ledger_totals_at(period))
+
+
+def rebuild_all_ledger_snapshots():
+    closed_periods = AccountingPeriod.objects.filter(is_closed=True).order_by('end_date')
+
+    with transaction.atomic():
+        LedgerSnapshot.objects.all().delete()
+        for period in closed_periods:
+            rebuild_ledger_snapshots(period)
+
+
+def opening_balance(account, before):
+    snapshot = (
+        account.snapshots
+        .filter(as_of__lt=before)
+        .order_by('-as_of')
+        .first()
+    )
+
+    balance = ZERO
+    lines = JournalEntryLine.objects.filter(
+        account=account,
+        journal_entry__date__lt=before
+    )
+
+    # نمسح فقط الحركات التي تلي أقرب لقطة
+    if snapshot:
+        balance = snapshot.balance
+        lines = lines.filter(journal_entry__date__gt=snapshot.as_of)
+
+    movement = lines.aggregate(debit=Sum('debit'), credit=Sum('credit'))
+
+    return balance + (movement['debit'] or ZERO) - (movement['credit'] or ZERO)
+
+
+def encode_ledger_cursor(account, line, balance):
+    return signing.dumps(
+        {
+            'account': account.pk,
+            'date': line.journal_entry.date.isoformat(),
+            'id': line.pk,
+            'balance': str(balance),
+        },
+        salt=LEDGER_CURSOR_SALT
+    )
+
+
+def decode_ledger_cursor(account, cursor):
+    try:
+        data = signing.loads(cursor, salt=LEDGER_CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+    if data.get('account') != account.pk:
+        return None
+
+    return {
+        'date': date.fromisoformat(data['date']),
+        'id': data['id'],
+        'balance': Decimal(data['balance']),
+    }
+
+
+def general_ledger(account, date_from=None, date_to=None, cursor=None,
+                   page_size=LEDGER_PAGE_SIZE):
+    lines = (
+        JournalEntryLine.objects
+        .filter(account=account)
+        .select_related('journal_entry')
+        .order_by('journal_entry__date', 'id')
+    )
+
+    if date_from:
+        lines = lines.filter(journal_entry__date__gte=date_from)
+    if date_to:
+        lines = lines.filter(journal_entry__date__lte=date_to)
+
+    position = decode_ledger_cursor(account, cursor) if cursor else None
+
+    # الصفحة تبدأ من آخر سطر في الصفحة السابقة ورصيدها محمول في المؤشر
+    if position:
+        opening = position['balance']
+        lines = lines.filter(
+            Q(journal_entry__date__gt=position['date']) |
+            Q(journal_entry__date=position['date'], id__gt=position['id'])
+        )
+    elif date_from:
+        opening = opening_balance(account, date_from)
+    else:
+        opening = ZERO
+
+    rows = list(lines[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    running_balance = opening
+    for line in rows:
+        running_balance += line.debit - line.credit
+        line.running_balance = running_balance
+
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_ledger_cursor(account, rows[-1], running_balance)
 
-    period.is_closed = True
-    period.save()
+    return {
+        'opening_balance': opening,
+        'lines': rows,
+        'closing_balance': running_balance,
+        'next_cursor': next_cursor,
+        'is_first_page': position is None,
+    }
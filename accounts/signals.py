@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# يُرسل بعد التزام المعاملة التي اعتمدت القيود
+# entries: قائمة القيود المعتمدة
+entries_approved = Signal()
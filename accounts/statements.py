@@ -0,0 +1,282 @@
+from datetime import timedelta
+
+from django.db.models import Q, Sum
+
+from .models import Account, AccountClosure, AccountingPeriod
+from .services import ZERO, tree_order
+
+
+BALANCE_SHEET_SECTIONS = (
+    ('asset', 'الأصول'),
+    ('liability', 'الخصوم'),
+    ('equity', 'حقوق الملكية'),
+)
+
+INCOME_STATEMENT_SECTIONS = (
+    ('revenue', 'الإيرادات'),
+    ('expense', 'المصروفات'),
+)
+
+# الأصول والمصروفات طبيعتها مدينة، وباقي الأنواع دائنة
+DEBIT_NATURE = ('asset', 'expense')
+
+
+# =========================
+# الأرصدة التراكمية في تواريخ محددة
+# =========================
+def cumulative_balances(dates):
+    # {تاريخ: {معرف الحساب: (مدين، دائن)}} مجمعة على الحساب وكل فروعه
+    dates = sorted(set(dates))
+    if not dates:
+        return {}
+
+    closed_periods = list(
+        AccountingPeriod.objects
+        .filter(is_closed=True, end_date__lte=dates[-1], snapshots__isnull=False)
+        .distinct()
+        .order_by('end_date')
+    )
+
+    # لكل تاريخ: أقرب لقطة قبله، ثم الحركات بين اللقطة والتاريخ فقط
+    bases = {}
+    for day in dates:
+        base = None
+        for period in closed_periods:
+            if period.end_date <= day:
+                base = period
+        bases[day] = base
+
+    totals = {day: {} for day in dates}
+
+    snapshot_periods = {base.pk for base in bases.values() if base}
+    if snapshot_periods:
+        annotations = {}
+        for index, day in enumerate(dates):
+            if bases[day]:
+                condition = Q(descendant__snapshots__period_id=bases[day].pk)
+                annotations[f'debit_{index}'] = Sum('descendant__snapshots__debit', filter=condition)
+                annotations[f'credit_{index}'] = Sum('descendant__snapshots__credit', filter=condition)
+
+        rows = (
+            AccountClosure.objects
+            .filter(descendant__snapshots__period_id__in=snapshot_periods)
+            .values('ancestor_id')
+            .annotate(**annotations)
+            .order_by()
+        )
+        _collect(rows, dates, totals)
+
+    # المسودات لا تدخل القوائم، كما في الأرباح والخسائر وأرصدة الفترات
+    approved = Q(descendant__journalentryline__journal_entry__status='approved')
+
+    gaps = {}
+    for index, day in enumerate(dates):
+        gap = approved & Q(descendant__journalentryline__journal_entry__date__lte=day)
+        if bases[day]:
+            gap &= Q(descendant__journalentryline__journal_entry__date__gt=bases[day].end_date)
+        gaps[index] = gap
+
+    annotations = {}
+    for index, gap in gaps.items():
+        annotations[f'debit_{index}'] = Sum('descendant__journalentryline__debit', filter=gap)
+        annotations[f'credit_{index}'] = Sum('descendant__journalentryline__credit', filter=gap)
+
+    # استعلام واحد يغطي كل الفجوات، وكل عمود يجمع فجوته فقط
+    # شرط واحد في filter() واحد حتى لا يُنشئ Django ربطاً ثانياً بالأسطر
+    lower_bounds = [bases[day].end_date if bases[day] else None for day in dates]
+    window = approved & Q(descendant__journalentryline__journal_entry__date__lte=dates[-1])
+    if None not in lower_bounds:
+        window &= Q(descendant__journalentryline__journal_entry__date__gt=min(lower_bounds))
+    lines = AccountClosure.objects.filter(window)
+
+    rows = lines.values('ancestor_id').annotate(**annotations).order_by()
+    _collect(rows, dates, totals)
+
+    return totals
+
+
+def closing_movements(ranges):
+    # قيود الإقفال تُصفّر الإيرادات والمصروفات، فنستبعدها من قائمة الدخل
+    windows = [
+        Q(
+            descendant__journalentryline__journal_entry__status='approved',
+            descendant__journalentryline__journal_entry__date__gte=date_from,
+            descendant__journalentryline__journal_entry__date__lte=date_to,
+        )
+        for date_from, date_to in ranges
+    ]
+
+    annotations = {}
+    for index, window in enumerate(windows):
+        annotations[f'debit_{index}'] = Sum('descendant__journalentryline__debit', filter=window)
+        annotations[f'credit_{index}'] = Sum('descendant__journalentryline__credit', filter=window)
+
+    rows = (
+        AccountClosure.objects
+        .filter(
+            descendant__account_type__in=('revenue', 'expense'),
+            descendant__journalentryline__journal_entry__entry_type='closing',
+            descendant__journalentryline__journal_entry__status='approved',
+            descendant__journalentryline__journal_entry__date__gte=min(r[0] for r in ranges),
+            descendant__journalentryline__journal_entry__date__lte=max(r[1] for r in ranges),
+        )
+        .values('ancestor_id')
+        .annotate(**annotations)
+        .order_by()
+    )
+
+    movements = [{} for _ in ranges]
+    for row in rows:
+        for index in range(len(ranges)):
+            debit = row[f'debit_{index}'] or ZERO
+            credit = row[f'credit_{index}'] or ZERO
+            if debit or credit:
+                movements[index][row['ancestor_id']] = (debit, credit)
+
+    return movements
+
+
+def _collect(rows, dates, totals):
+    for row in rows:
+        for index, day in enumerate(dates):
+            debit = row.get(f'debit_{index}') or ZERO
+            credit = row.get(f'credit_{index}') or ZERO
+            if not debit and not credit:
+                continue
+            previous_debit, previous_credit = totals[day].get(row['ancestor_id'], (ZERO, ZERO))
+            totals[day][row['ancestor_id']] = (previous_debit + debit, previous_credit + credit)
+
+
+def _natural(account_type, debit, credit):
+    if account_type in DEBIT_NATURE:
+        return debit - credit
+    return credit - debit
+
+
+def _sections(accounts, section_types, column_values, columns):
+    # column_values: دالة تُرجع قيم الأعمدة لحساب معين
+    types = {account.pk: account.account_type for account in accounts}
+
+    sections = []
+    for account_type, title in section_types:
+        rows = []
+        totals = [ZERO] * columns
+        for account in accounts:
+            if account.account_type != account_type:
+                continue
+
+            values = column_values(account)
+            if not any(values):
+                continue
+
+            rows.append({'account': account, 'depth': account.depth, 'values': values})
+
+            # نجمع أعلى حساب من نوعه فقط، لأن رصيده يشمل فروعه
+            if types.get(account.parent_id) != account_type:
+                totals = [total + value for total, value in zip(totals, values)]
+
+        sections.append({
+            'type': account_type,
+            'title': title,
+            'rows': rows,
+            'totals': totals,
+        })
+
+    return sections
+
+
+def _accounts():
+    return tree_order(list(Account.objects.all()))
+
+
+def _net_income(accounts, balances):
+    types = {account.pk: account.account_type for account in accounts}
+    income_types = ('revenue', 'expense')
+
+    total = ZERO
+    for account in accounts:
+        if account.account_type in income_types and types.get(account.parent_id) not in income_types:
+            debit, credit = balances.get(account.pk, (ZERO, ZERO))
+            total += credit - debit
+    return total
+
+
+# =========================
+# الميزانية العمومية
+# =========================
+def balance_sheet(as_of_dates):
+    accounts = _accounts()
+    balances = cumulative_balances(as_of_dates)
+
+    def column_values(account):
+        return [
+            _natural(account.account_type, *balances[day].get(account.pk, (ZERO, ZERO)))
+            for day in as_of_dates
+        ]
+
+    sections = _sections(accounts, BALANCE_SHEET_SECTIONS, column_values, len(as_of_dates))
+
+    # صافي الربح غير المقفل بعد إلى حقوق الملكية حتى تتوازن الميزانية
+    unclosed_income = [_net_income(accounts, balances[day]) for day in as_of_dates]
+
+    by_type = {section['type']: section['totals'] for section in sections}
+    total_liabilities_equity = [
+        liability + equity + income
+        for liability, equity, income in zip(
+            by_type['liability'], by_type['equity'], unclosed_income
+        )
+    ]
+
+    return {
+        'columns': as_of_dates,
+        'sections': sections,
+        'unclosed_income': unclosed_income,
+        'total_assets': by_type['asset'],
+        'total_liabilities_equity': total_liabilities_equity,
+    }
+
+
+# =========================
+# قائمة الدخل
+# =========================
+def income_statement(ranges):
+    # ranges: [(من تاريخ، إلى تاريخ)]، والحركة = الرصيد التراكمي في النهاية ناقص ما قبل البداية
+    accounts = _accounts()
+
+    dates = []
+    for date_from, date_to in ranges:
+        dates += [date_from - timedelta(days=1), date_to]
+    balances = cumulative_balances(dates)
+    closings = closing_movements(ranges)
+
+    def movement(account, index, date_from, date_to):
+        end_debit, end_credit = balances[date_to].get(account.pk, (ZERO, ZERO))
+        start_debit, start_credit = balances[date_from - timedelta(days=1)].get(account.pk, (ZERO, ZERO))
+        closing_debit, closing_credit = closings[index].get(account.pk, (ZERO, ZERO))
+        return _natural(
+            account.account_type,
+            end_debit - start_debit - closing_debit,
+            end_credit - start_credit - closing_credit
+        )
+
+    def column_values(account):
+        return [
+            movement(account, index, date_from, date_to)
+            for index, (date_from, date_to) in enumerate(ranges)
+        ]
+
+    sections = _sections(accounts, INCOME_STATEMENT_SECTIONS, column_values, len(ranges))
+
+    by_type = {section['type']: section['totals'] for section in sections}
+    net_income = [
+        revenue - expense
+        for revenue, expense in zip(by_type['revenue'], by_type['expense'])
+    ]
+
+    return {
+        'columns': ranges,
+        'sections': sections,
+        'total_revenue': by_type['revenue'],
+        'total_expense': by_type['expense'],
+        'net_income': net_income,
+    }
@@ -1,3 +1,837 @@
-from django.test import TestCase
+import importlib
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.auth.models import Permission
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, exports, forms, jobs, periods, statements
+from .models import (
+    Account,
+    AccountBalance,
+    AccountClosure,
+    AccountingPeriod,
+    BackgroundJob,
+    Invoice,
+    InvoiceItem,
+    JournalEntry,
+    JournalEntryLine,
+    User,
+)
+from .services import (
+    PROFIT_AND_LOSS_CACHE_KEY,
+    account_choices,
+    apply_approved_lines,
+    approve_journal_entry,
+    cached_profit_and_loss,
+    close_accounting_period,
+    post_journal_entries,
+    rebuild_account_balances,
+    rebuild_account_closure,
+    trial_balance,
+)
+
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+# الجلسات والمستخدمون والصلاحيات في الذاكرة المؤقتة، فلكل اختبار ذاكرة محلية نظيفة
+@override_settings(CACHES=LOCAL_CACHES)
+class LedgerTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='accountant',
+            password='secret',
+            role='accountant'
+        )
+        cls.cash = Account.objects.create(code='1100', name='الصندوق', account_type='asset')
+        cls.revenue = Account.objects.create(code='4100', name='المبيعات', account_type='revenue')
+
+    def setUp(self):
+        cache.clear()
+
+    def create_entries(self, count):
+        post_journal_entries([
+            (
+                JournalEntry(date='2026-01-01', description=f'قيد {i}', created_by=self.user),
+                [
+                    JournalEntryLine(account=self.cash, debit=Decimal('10'), credit=0),
+                    JournalEntryLine(account=self.revenue, debit=0, credit=Decimal('10')),
+                ],
+            )
+            for i in range(count)
+        ])
+
+
+    def post_approved(self, date, debit_account, credit_account, amount):
+        entry = JournalEntry(
+            date=date,
+            description='قيد معتمد',
+            status='approved',
+            posted=True,
+            created_by=self.user,
+        )
+        lines = [
+            JournalEntryLine(account=debit_account, debit=Decimal(amount), credit=0),
+            JournalEntryLine(account=credit_account, debit=0, credit=Decimal(amount)),
+        ]
+        post_journal_entries([(entry, lines)])
+        apply_approved_lines([(entry, lines)])
+        return entry
+
+    def create_period(self, name, start_date, end_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AccountingPeriod.objects.create(name=name, start_date=start_date, end_date=end_date)
+
+    def close_period(self, period):
+        with self.captureOnCommitCallbacks(execute=True):
+            return close_accounting_period(period, self.user)
+
+
+class AccountantDashboardQueriesTests(LedgerTestCase):
+
+    def dashboard_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('accountant_dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('accountant_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_entries(self):
+        self.create_entries(3)
+        few = self.dashboard_queries()
+
+        self.create_entries(40)
+        many = self.dashboard_queries()
+
+        self.assertEqual(few, many)
+
+    def test_lines_accounts_are_not_loaded_per_line(self):
+        self.create_entries(10)
+        self.client.force_login(self.user)
+        # الطلب الأول يملأ الذاكرة المؤقتة: المستخدم وصلاحياته والحسابات والفترات
+        self.client.get(reverse('accountant_dashboard'), {'status': 'draft'})
+
+        with self.assertNumQueries(3):
+            self.client.get(reverse('accountant_dashboard'), {'status': 'draft'})
+
+
+
+class AccountChoicesTests(LedgerTestCase):
+
+    def test_account_choices_follow_account_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bank = Account.objects.create(code='1200', name='البنك', account_type='asset')
+        self.assertIn((bank.pk, str(bank)), account_choices())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bank.delete()
+        self.assertNotIn('1200', [label[:4] for _, label in account_choices()])
+
+
+
+class CachedPermissionsTests(LedgerTestCase):
+
+    def test_cached_permissions_follow_permission_changes(self):
+        permission = Permission.objects.get(
+            content_type__app_label='accounts',
+            content_type__model='account',
+            codename='view_trial_balance'
+        )
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('trial_balance')).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(permission)
+        self.assertEqual(self.client.get(reverse('trial_balance')).status_code, 200)
+
+    def test_revoked_permission_stays_revoked_after_eviction(self):
+        permission = Permission.objects.get(
+            content_type__app_label='accounts',
+            content_type__model='account',
+            codename='view_trial_balance'
+        )
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(permission)
+        self.assertEqual(self.client.get(reverse('trial_balance')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.remove(permission)
+        self.assertEqual(self.client.get(reverse('trial_balance')).status_code, 403)
+
+        # حذف مفتاح الإصدار وحده لا يعيد صلاحيات مخزنة تحت إصدار سابق
+        cache.delete(caching._version_key('permissions'))
+        for _ in range(3):
+            caching.bump_version('permissions')
+            self.assertEqual(self.client.get(reverse('trial_balance')).status_code, 403)
+
+
+
+class PeriodIndexTests(LedgerTestCase):
+
+    def test_entries_get_their_period_from_the_date(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            january = AccountingPeriod.objects.create(
+                name='يناير', start_date='2026-01-01', end_date='2026-01-31'
+            )
+        self.create_entries(1)
+        self.assertEqual(JournalEntry.objects.get().period, january)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            january.is_closed = True
+            january.save()
+        # الإقفال يبطل الفهرس، وبعد إعادة بنائه لا حاجة لقاعدة البيانات
+        self.assertTrue(periods.is_closed(january.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(periods.is_closed(january.pk))
+
+    def test_cache_versions_do_not_repeat_after_eviction(self):
+        first = caching.get_version('periods')
+        caching.bump_version('periods')
+        bumped = caching.get_version('periods')
+
+        cache.clear()
+        self.assertNotIn(caching.get_version('periods'), (first, bumped))
+
+    def test_writes_check_closed_periods_in_the_database(self):
+        january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        self.create_entries(1)
+        draft = JournalEntry.objects.get()
+
+        # إقفال لم يصل إبطاله إلى هذه العملية
+        AccountingPeriod.objects.filter(pk=january.pk).update(is_closed=True)
+        self.assertFalse(periods.is_closed(january.pk))
+
+        with self.assertRaises(ValidationError):
+            self.create_entries(1)
+        with self.assertRaises(ValidationError):
+            approve_journal_entry(draft)
+        self.assertEqual(JournalEntry.objects.count(), 1)
+
+
+class ClosePeriodTests(LedgerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.expense = Account.objects.create(code='5100', name='الرواتب', account_type='expense')
+        cls.retained = Account.objects.create(code='3100', name='الأرباح المحتجزة', account_type='equity')
+
+    def setUp(self):
+        super().setUp()
+        self.january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        self.post_approved('2026-01-10', self.cash, self.revenue, '100.00')
+        self.post_approved('2026-01-20', self.expense, self.cash, '40.00')
+
+    def test_closing_entry_moves_net_income_to_retained_earnings(self):
+        self.close_period(self.january)
+
+        entry = JournalEntry.objects.get(entry_type='closing')
+        self.assertEqual(entry.period, self.january)
+        self.assertEqual(str(entry.date), '2026-01-31')
+        self.assertEqual(
+            sorted(entry.lines.values_list('account__code', 'debit', 'credit')),
+            [
+                ('3100', Decimal('0.00'), Decimal('60.00')),
+                ('4100', Decimal('100.00'), Decimal('0.00')),
+                ('5100', Decimal('0.00'), Decimal('40.00')),
+            ]
+        )
+
+    def test_snapshots_hold_post_closing_totals(self):
+        self.close_period(self.january)
+
+        self.january.refresh_from_db()
+        self.assertTrue(self.january.is_closed)
+        self.assertEqual(
+            sorted(self.january.snapshots.values_list('account__code', 'debit', 'credit')),
+            [
+                ('1100', Decimal('100.00'), Decimal('40.00')),
+                ('3100', Decimal('0.00'), Decimal('60.00')),
+                ('4100', Decimal('100.00'), Decimal('100.00')),
+                ('5100', Decimal('40.00'), Decimal('40.00')),
+            ]
+        )
+
+    def test_period_balances_match_the_ledger_after_closing(self):
+        february = self.create_period('فبراير', '2026-02-01', '2026-02-28')
+        self.post_approved('2026-02-03', self.cash, self.revenue, '25.00')
+        self.close_period(self.january)
+
+        output = StringIO()
+        call_command('reconcile_period_balances', stdout=output)
+        self.assertIn("لا فروقات", output.getvalue())
+
+        self.assertTrue(all(self.january.account_balances.values_list('is_frozen', flat=True)))
+        self.assertEqual(
+            february.account_balances.get(account=self.revenue).closing,
+            Decimal('-25.00')
+        )
+        self.assertEqual(
+            february.account_balances.get(account=self.retained).opening,
+            Decimal('-60.00')
+        )
+
+    def test_periods_are_closed_in_order(self):
+        february = self.create_period('فبراير', '2026-02-01', '2026-02-28')
+        self.post_approved('2026-02-03', self.cash, self.revenue, '25.00')
+
+        with self.assertRaises(ValidationError):
+            self.close_period(february)
+        self.assertFalse(JournalEntry.objects.filter(entry_type='closing').exists())
+
+        self.close_period(self.january)
+        self.close_period(february)
+        revenue = self.revenue.snapshots.get(period=february)
+        self.assertEqual(revenue.debit, revenue.credit)
+        self.assertEqual(
+            self.retained.snapshots.get(period=february).credit,
+            Decimal('85.00')
+        )
+
+    def test_closed_period_rejects_new_entries(self):
+        self.close_period(self.january)
+
+        with self.assertRaises(ValidationError):
+            self.post_approved('2026-01-25', self.cash, self.revenue, '10.00')
+        with self.assertRaises(ValidationError):
+            self.close_period(self.january)
+
+
+class StatementsTests(LedgerTestCase):
+    # يناير مقفل وفبراير مفتوح
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.expense = Account.objects.create(code='5100', name='الرواتب', account_type='expense')
+        cls.retained = Account.objects.create(code='3100', name='الأرباح المحتجزة', account_type='equity')
+
+    def setUp(self):
+        super().setUp()
+        january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        self.create_period('فبراير', '2026-02-01', '2026-02-28')
+        self.post_approved('2026-01-10', self.cash, self.revenue, '100.00')
+        self.post_approved('2026-01-20', self.expense, self.cash, '40.00')
+        self.close_period(january)
+        self.post_approved('2026-02-03', self.cash, self.revenue, '25.00')
+
+    def test_cumulative_balances_start_from_the_closed_period_snapshot(self):
+        balances = statements.cumulative_balances([date(2026, 1, 31), date(2026, 2, 28)])
+
+        self.assertEqual(balances[date(2026, 1, 31)][self.revenue.pk], (Decimal('100.00'), Decimal('100.00')))
+        self.assertEqual(balances[date(2026, 2, 28)][self.revenue.pk], (Decimal('100.00'), Decimal('125.00')))
+        self.assertEqual(balances[date(2026, 2, 28)][self.cash.pk], (Decimal('125.00'), Decimal('40.00')))
+        self.assertEqual(balances[date(2026, 2, 28)][self.retained.pk], (Decimal('0.00'), Decimal('60.00')))
+
+    def test_balance_sheet_balances_with_unclosed_income(self):
+        sheet = statements.balance_sheet([date(2026, 1, 31), date(2026, 2, 28)])
+
+        self.assertEqual(sheet['unclosed_income'], [Decimal('0.00'), Decimal('25.00')])
+        self.assertEqual(sheet['total_assets'], [Decimal('60.00'), Decimal('85.00')])
+        self.assertEqual(sheet['total_liabilities_equity'], sheet['total_assets'])
+
+    def test_draft_entries_are_left_out(self):
+        post_journal_entries([(
+            JournalEntry(date='2026-02-10', description='بيع مسودة', created_by=self.user),
+            [
+                JournalEntryLine(account=self.cash, debit=Decimal('10'), credit=0),
+                JournalEntryLine(account=self.revenue, debit=0, credit=Decimal('10')),
+            ],
+        )])
+
+        statement = statements.income_statement([(date(2026, 1, 1), date(2026, 2, 28))])
+        sheet = statements.balance_sheet([date(2026, 1, 31), date(2026, 2, 28)])
+
+        self.assertEqual(statement['total_revenue'], [Decimal('125.00')])
+        self.assertEqual(sheet['total_assets'], [Decimal('60.00'), Decimal('85.00')])
+        self.assertEqual(sheet['unclosed_income'], [Decimal('0.00'), Decimal('25.00')])
+
+    def test_income_statement_excludes_the_closing_entry(self):
+        statement = statements.income_statement([
+            (date(2026, 1, 1), date(2026, 1, 31)),
+            (date(2026, 2, 1), date(2026, 2, 28)),
+        ])
+
+        self.assertEqual(statement['total_revenue'], [Decimal('100.00'), Decimal('25.00')])
+        self.assertEqual(statement['total_expense'], [Decimal('40.00'), Decimal('0.00')])
+        self.assertEqual(statement['net_income'], [Decimal('60.00'), Decimal('25.00')])
+
+
+class PostJournalEntriesTests(LedgerTestCase):
+
+    def test_entries_get_their_ids_without_returning_bulk_insert(self):
+        # كما في MySQL الذي لا يعيد المعرفات من bulk_create
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            with CaptureQueriesContext(connection) as queries:
+                self.create_entries(3)
+
+        # إدخال واحد لكل الرؤوس بدلاً من حفظ كل قيد منفرداً
+        inserts = [
+            query for query in queries
+            if query['sql'].startswith(f"INSERT INTO {connection.ops.quote_name('accounts_journalentry')} ")
+        ]
+        self.assertEqual(len(inserts), 1)
+
+        entries = JournalEntry.objects.order_by('pk')
+        self.assertEqual([entry.description for entry in entries], ['قيد 0', 'قيد 1', 'قيد 2'])
+        for entry in entries:
+            self.assertEqual(
+                sorted(entry.lines.values_list('account__code', flat=True)),
+                ['1100', '4100']
+            )
+
+
+class AccountBalancesTests(LedgerTestCase):
+
+    def balances(self):
+        return {
+            account_id: (debit, credit)
+            for account_id, debit, credit in AccountBalance.objects.values_list('account_id', 'debit', 'credit')
+            if debit or credit
+        }
+
+    def assertBalancesMatchLedger(self):
+        maintained = self.balances()
+        rebuild_account_balances()
+        self.assertEqual(maintained, self.balances())
+
+    def test_balances_follow_line_saves_edits_and_deletes(self):
+        bank = Account.objects.create(code='1200', name='البنك', account_type='asset')
+        entry = JournalEntry.objects.create(date='2026-01-01', description='قيد', created_by=self.user)
+        debit = JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit=Decimal('30'), credit=0)
+        JournalEntryLine.objects.create(journal_entry=entry, account=self.revenue, debit=0, credit=Decimal('30'))
+        self.assertBalancesMatchLedger()
+
+        debit.debit = Decimal('45')
+        debit.save()
+        self.assertBalancesMatchLedger()
+
+        # نقل السطر إلى حساب آخر يطرحه من الأول ويضيفه إلى الثاني
+        debit.account = bank
+        debit.save()
+        self.assertBalancesMatchLedger()
+        self.assertNotIn(self.cash.pk, self.balances())
+
+        debit.delete()
+        self.assertBalancesMatchLedger()
+
+    def test_trial_balance_query_count_does_not_grow_with_the_chart(self):
+        def accounts_with_entries(start, count):
+            for number in range(start, start + count):
+                account = Account.objects.create(code=f'1{number:03d}', name=f'حساب {number}', account_type='asset')
+                post_journal_entries([(
+                    JournalEntry(date='2026-01-01', description='قيد', created_by=self.user),
+                    [
+                        JournalEntryLine(account=account, debit=Decimal('1'), credit=0),
+                        JournalEntryLine(account=self.revenue, debit=0, credit=Decimal('1')),
+                    ],
+                )])
+
+        accounts_with_entries(200, 3)
+        with self.assertNumQueries(1):
+            few = trial_balance(materialized=True)
+
+        accounts_with_entries(300, 30)
+        with self.assertNumQueries(1):
+            many = trial_balance(materialized=True)
+
+        self.assertEqual((len(few['rows']), len(many['rows'])), (4, 34))
+        self.assertEqual(many['total_debit'], many['total_credit'])
+
+
+class EntryTotalsTests(LedgerTestCase):
+
+    def totals(self, entry):
+        entry.refresh_from_db(fields=['total_debit', 'total_credit', 'is_balanced'])
+        return entry.total_debit, entry.total_credit, entry.is_balanced
+
+    def verify(self, *args):
+        output = StringIO()
+        call_command('verify_entry_totals', *args, stdout=output)
+        return output.getvalue()
+
+    def test_totals_follow_line_edits_and_deletes(self):
+        entry = JournalEntry.objects.create(date='2026-01-01', description='قيد', created_by=self.user)
+        other = JournalEntry.objects.create(date='2026-01-01', description='قيد آخر', created_by=self.user)
+        debit = JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit=Decimal('30'), credit=0)
+        JournalEntryLine.objects.create(journal_entry=entry, account=self.revenue, debit=0, credit=Decimal('30'))
+        self.assertEqual(self.totals(entry), (Decimal('30.00'), Decimal('30.00'), True))
+
+        # is_balanced يُحسب بعد تحديث المجموعين وليس من قيمهما القديمة
+        debit.debit = Decimal('45')
+        debit.save()
+        self.assertEqual(self.totals(entry), (Decimal('45.00'), Decimal('30.00'), False))
+
+        debit.journal_entry = other
+        debit.save()
+        self.assertEqual(self.totals(entry), (Decimal('0.00'), Decimal('30.00'), False))
+        self.assertEqual(self.totals(other), (Decimal('45.00'), Decimal('0.00'), False))
+
+        debit.delete()
+        self.assertEqual(self.totals(other), (Decimal('0.00'), Decimal('0.00'), True))
+        self.assertIn("كل المجاميع مطابقة", self.verify())
+
+    def test_verify_entry_totals_fixes_drift(self):
+        self.create_entries(2)
+        JournalEntry.objects.filter(pk=JournalEntry.objects.first().pk).update(total_debit=Decimal('99'))
+
+        self.assertIn("1 قيد من 2", self.verify())
+        self.verify('--fix')
+        self.assertIn("كل المجاميع مطابقة", self.verify())
+
+
+class AccountClosureTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.assets = Account.objects.create(code='1000', name='الأصول', account_type='asset')
+        self.current = Account.objects.create(code='1010', name='المتداولة', account_type='asset', parent=self.assets)
+        self.bank = Account.objects.create(code='1011', name='البنك', account_type='asset', parent=self.current)
+        self.fixed = Account.objects.create(code='1500', name='الثابتة', account_type='asset')
+
+    def closure(self):
+        return set(AccountClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assertClosureMatchesTree(self):
+        maintained = self.closure()
+        rebuild_account_closure()
+        self.assertEqual(maintained, self.closure())
+
+    def test_closure_follows_moves_and_detaches(self):
+        self.assertClosureMatchesTree()
+
+        # نقل فرع كامل تحت أب آخر
+        self.current.parent = self.fixed
+        self.current.save()
+        self.assertClosureMatchesTree()
+        self.assertIn((self.fixed.pk, self.bank.pk, 2), self.closure())
+
+        self.current.parent = None
+        self.current.save()
+        self.assertClosureMatchesTree()
+        self.assertNotIn(self.fixed.pk, [ancestor for ancestor, descendant, _ in self.closure() if descendant == self.bank.pk])
+
+    def test_account_cannot_move_under_its_own_descendant(self):
+        self.assets.parent = self.bank
+        with self.assertRaises(ValidationError):
+            self.assets.full_clean()
+
+
+class ProfitAndLossCacheTests(LedgerTestCase):
+
+    def test_status_change_outside_approval_refreshes_figures(self):
+        self.create_entries(1)
+        self.assertEqual(cached_profit_and_loss()['income'], 0)
+
+        # كما يحدث عند تغيير الحالة من لوحة الإدارة
+        entry = JournalEntry.objects.get()
+        entry.status = 'approved'
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        self.assertEqual(cached_profit_and_loss()['income'], Decimal('10.00'))
+
+    def test_figures_computed_before_a_commit_are_not_served_after_it(self):
+        self.create_entries(1)
+        version = caching.get_version('profit_and_loss')
+        stale = cached_profit_and_loss()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_journal_entry(JournalEntry.objects.get())
+        # قارئ متأخر يكتب ما حسبه قبل الالتزام
+        cache.set(f"{PROFIT_AND_LOSS_CACHE_KEY}:{version}", stale)
+
+        self.assertEqual(cached_profit_and_loss()['income'], Decimal('10.00'))
+
+
+class ApproveJournalEntryTests(LedgerTestCase):
+
+    def test_entry_is_approved_only_once(self):
+        january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        self.create_entries(1)
+        entry = JournalEntry.objects.get()
+
+        self.assertTrue(approve_journal_entry(entry))
+        # نسخة قديمة من القيد كما تصل من طلب متزامن
+        self.assertFalse(approve_journal_entry(entry))
+
+        balance = january.account_balances.get(account=self.cash)
+        self.assertEqual((balance.debit, balance.closing), (Decimal('10.00'), Decimal('10.00')))
+
+
+class BackgroundJobTests(LedgerTestCase):
+
+    def test_close_period_job_runs_synchronously(self):
+        january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        Account.objects.create(code='3100', name='الأرباح المحتجزة', account_type='equity')
+        self.post_approved('2026-01-10', self.cash, self.revenue, '10.00')
+        job = jobs.enqueue('close_period', user=self.user, period_id=january.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job = jobs.run_job(jobs.claim_job('test'))
+
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertEqual(job.worker, 'test')
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertTrue(periods.is_closed(january.pk))
+        self.assertTrue(JournalEntry.objects.filter(entry_type='closing', period=january).exists())
+
+    @override_settings(BACKGROUND_JOBS_STALE_AFTER=60)
+    def test_jobs_of_dead_workers_are_failed(self):
+        now = timezone.now()
+        stale = BackgroundJob.objects.create(
+            name='rebuild_account_balances', status='running', heartbeat_at=now - timedelta(minutes=5)
+        )
+        alive = BackgroundJob.objects.create(
+            name='rebuild_account_balances', status='running', heartbeat_at=now
+        )
+
+        self.assertIsNone(jobs.claim_job('test'))
+
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertIsNotNone(stale.finished_at)
+        self.assertEqual(alive.status, 'running')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportLedgerJobTests(LedgerTestCase):
+
+    def test_csv_upload_is_imported_by_the_worker(self):
+        path = default_storage.save('imports/entries.csv', ContentFile(
+            "entry,date,description,account,debit,credit\n"
+            "A1,2026-01-05,بيع نقدي,1100,150.00,\n"
+            "A1,2026-01-05,بيع نقدي,4100,,150.00\n"
+            "A2,2026-01-06,بيع نقدي,1100,20.00,\n"
+            "A2,2026-01-06,بيع نقدي,4100,,20.00\n".encode()
+        ))
+        job = jobs.enqueue('import_ledger', user=self.user, path=path, kind='entries', file_format='csv')
+
+        job = jobs.run_job(jobs.claim_job('test'))
+
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertEqual(job.progress, 100)
+        self.assertFalse(default_storage.exists(path))
+        self.assertEqual(JournalEntry.objects.count(), 2)
+        self.assertEqual(
+            sorted(JournalEntryLine.objects.values_list('account__code', 'debit', 'credit')),
+            [
+                ('1100', Decimal('20.00'), Decimal('0.00')),
+                ('1100', Decimal('150.00'), Decimal('0.00')),
+                ('4100', Decimal('0.00'), Decimal('20.00')),
+                ('4100', Decimal('0.00'), Decimal('150.00')),
+            ]
+        )
+
+
+class ImpossibleDatesTests(LedgerTestCase):
+
+    def test_impossible_dates_are_ignored(self):
+        self.user.user_permissions.add(Permission.objects.get(
+            content_type__app_label='accounts',
+            content_type__model='account',
+            codename='view_trial_balance'
+        ))
+        self.client.force_login(self.user)
+        dates = {'date_from': '2026-13-45', 'date_to': '2026-02-30', 'as_of': '2026-00-01'}
+
+        for name in ('accountant_invoices', 'balance_sheet', 'income_statement'):
+            with self.subTest(name):
+                self.assertEqual(self.client.get(reverse(name), dates).status_code, 200)
+
+
+class InvoiceTotalsTests(LedgerTestCase):
+
+    def create_invoice(self, number):
+        return Invoice.objects.create(
+            invoice_number=number,
+            invoice_type='sale',
+            customer_name='عميل',
+            invoice_date='2026-01-05',
+            created_by=self.user,
+        )
+
+    def total(self, invoice):
+        invoice.refresh_from_db(fields=['total_amount'])
+        return invoice.total_amount
+
+    def test_items_update_the_total_by_their_difference(self):
+        invoice = self.create_invoice('F-1')
+        item = InvoiceItem.objects.create(invoice=invoice, description='صنف', quantity=2, unit_price=Decimal('5.00'))
+        InvoiceItem.objects.create(invoice=invoice, description='صنف', quantity=1, unit_price=Decimal('1.00'))
+        self.assertEqual(self.total(invoice), Decimal('11.00'))
+
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self.total(invoice), Decimal('16.00'))
+
+        item.delete()
+        self.assertEqual(self.total(invoice), Decimal('1.00'))
+        self.assertEqual(self.total(invoice), invoice.calculate_total())
+
+    def test_moving_an_item_updates_both_invoices(self):
+        first = self.create_invoice('F-1')
+        second = self.create_invoice('F-2')
+        item = InvoiceItem.objects.create(invoice=first, description='صنف', quantity=2, unit_price=Decimal('5.00'))
+
+        item.invoice = second
+        item.save()
+
+        self.assertEqual(self.total(first), Decimal('0.00'))
+        self.assertEqual(self.total(second), Decimal('10.00'))
+
+    def test_saving_a_stale_invoice_keeps_the_total(self):
+        invoice = self.create_invoice('F-1')
+        stale = Invoice.objects.get(pk=invoice.pk)
+        InvoiceItem.objects.create(invoice=invoice, description='صنف', quantity=2, unit_price=Decimal('8.00'))
+
+        stale.customer_name = 'عميل آخر'
+        stale.save()
+
+        self.assertEqual(self.total(invoice), Decimal('16.00'))
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).customer_name, 'عميل آخر')
+
+    def test_recalculate_invoice_totals_fixes_drift(self):
+        invoice = self.create_invoice('F-1')
+        item = InvoiceItem.objects.create(invoice=invoice, description='صنف', quantity=2, unit_price=Decimal('5.00'))
+        InvoiceItem.objects.filter(pk=item.pk).update(unit_price=Decimal('6.00'))
+        Invoice.objects.filter(pk=invoice.pk).update(total_amount=Decimal('99.00'))
+
+        call_command('recalculate_invoice_totals', stdout=StringIO())
+
+        item.refresh_from_db()
+        self.assertEqual(item.total_price, Decimal('12.00'))
+        self.assertEqual(self.total(invoice), Decimal('12.00'))
+
+
+class ApproveInvoicesTests(LedgerTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Account.objects.create(code='3100', name='الأرباح المحتجزة', account_type='equity')
+
+    def setUp(self):
+        super().setUp()
+        self.january = self.create_period('يناير', '2026-01-01', '2026-01-31')
+        self.february = self.create_period('فبراير', '2026-02-01', '2026-02-28')
+        self.closed = self.add_item(self.create_invoice('F-1'))
+        self.open = [
+            self.add_item(self.create_invoice(number, '2026-02-10'))
+            for number in ('F-2', 'F-3')
+        ]
+        self.close_period(self.january)
+
+    def create_invoice(self, number, invoice_date='2026-01-05'):
+        return Invoice.objects.create(
+            invoice_number=number,
+            invoice_type='sale',
+            customer_name='عميل',
+            invoice_date=invoice_date,
+            created_by=self.user,
+        )
+
+    def add_item(self, invoice):
+        InvoiceItem.objects.create(invoice=invoice, description='صنف', quantity=1, unit_price=Decimal('10.00'))
+        return invoice
+
+    def approved_numbers(self):
+        return sorted(Invoice.objects.filter(is_approved=True).values_list('invoice_number', flat=True))
+
+    def test_bulk_approval_skips_closed_periods(self):
+        self.client.force_login(self.user)
+        ids = [str(invoice.pk) for invoice in [self.closed, *self.open]]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('approve_invoices'), {'invoice_ids': ids})
+
+        self.assertRedirects(response, reverse('accountant_invoices'), fetch_redirect_response=False)
+        self.assertEqual(self.approved_numbers(), ['F-2', 'F-3'])
+        self.assertEqual(
+            sorted(JournalEntry.objects.filter(entry_type='invoice').values_list('invoice__invoice_number', flat=True)),
+            ['F-2', 'F-3']
+        )
+        # تعليم الفواتير المعتمدة بتحديث واحد للدفعة
+        invoice_updates = [
+            query for query in queries
+            if query['sql'].startswith(f"UPDATE {connection.ops.quote_name('accounts_invoice')} ")
+        ]
+        self.assertEqual(len(invoice_updates), 1)
+
+    def test_bulk_approval_ignores_non_numeric_ids(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('approve_invoices'),
+            {'invoice_ids': ['abc', str(self.open[0].pk)]}
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.approved_numbers(), ['F-2'])
+
+    def test_admin_action_approves_selected_invoices(self):
+        admin = User.objects.create_superuser(username='admin', password='secret', email='admin@example.com')
+        self.client.force_login(admin)
+
+        self.client.post(reverse('admin:accounts_invoice_changelist'), {
+            'action': 'approve_selected',
+            '_selected_action': [invoice.pk for invoice in [self.closed, *self.open]],
+        })
+
+        self.assertEqual(self.approved_numbers(), ['F-2', 'F-3'])
+
+
+class ExportsTests(SimpleTestCase):
+
+    def test_xlsx_starts_a_new_sheet_when_one_is_full(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest("التصدير بصيغة xlsx يتطلب تثبيت openpyxl")
+
+        output = tempfile.TemporaryFile()
+        exports.write_xlsx(['رقم'], ([number] for number in range(5)), output, sheet_rows=2)
+        output.seek(0)
+
+        workbook = load_workbook(output, read_only=True)
+        self.assertEqual(
+            [list(sheet.values) for sheet in workbook.worksheets],
+            [
+                [('رقم',), (0,), (1,)],
+                [('رقم',), (2,), (3,)],
+                [('رقم',), (4,)],
+            ]
+        )
+        workbook.close()
+        output.close()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FormsImportTests(SimpleTestCase):
+    # SimpleTestCase يمنع أي استعلام، كما في قاعدة بيانات جديدة قبل migrate
+
+    def test_importing_forms_does_not_query_the_database(self):
+        cache.clear()
+        caching._local.clear()
+        importlib.reload(forms)
+        call_command('check', verbosity=0)
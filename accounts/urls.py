@@ -17,16 +17,38 @@ urlpatterns = [
     path('accountant/invoices/', views.accountant_invoices, name='accountant_invoices'),
     path('invoice/<int:invoice_id>/', views.invoice_detail, name='invoice_detail'),
     path('invoice/<int:invoice_id>/approve/', views.approve_invoice, name='approve_invoice'),
+    path('invoices/approve/', views.approve_invoices, name='approve_invoices'),
 
     path('general-ledger/', views.general_ledger, name='general_ledger'),
 
 
     path('trial-balance/', views.trial_balance, name='trial_balance'),
+    path('trial-balance/period/', views.period_trial_balance, name='period_trial_balance'),
+    path('trial-balance/consolidated/', views.consolidated_trial_balance, name='consolidated_trial_balance'),
+    path('balance-sheet/', views.balance_sheet, name='balance_sheet'),
+    path('income-statement/', views.income_statement, name='income_statement'),
+
+    # التصدير
+    path('general-ledger/export/', views.export_general_ledger, name='export_general_ledger'),
+    path('trial-balance/export/', views.export_trial_balance, name='export_trial_balance'),
+    path('accountant/invoices/export/', views.export_invoices, name='export_invoices'),
     path(
     'journal-entry/<int:entry_id>/approve/',
     views.approve_journal_entry,
     name='approve_journal_entry'
 ),
+    path('periods/<int:period_id>/close/', views.close_accounting_period, name='close_accounting_period'),
+
+    # الاستيراد
+    path('import/', views.import_ledger, name='import_ledger'),
+
+    # مؤشرات الأداء
+    path('metrics/', views.metrics_endpoint, name='metrics'),
+
+    # المهام الخلفية
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/download/', views.download_job_result, name='download_job_result'),
 
 
 ]
@@ -1,12 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+import os
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.urls import reverse
+from django.core.files.storage import default_storage
+from urllib.parse import urlencode
 from django.db import transaction
+from django.core.exceptions import ValidationError
 from .models import InvoiceItem
 from django.contrib import messages
-from django.db.models import Sum
-from decimal import Decimal
+from django.db.models import Prefetch
+from django.core.paginator import Paginator
 from .models import User, Invoice, InvoiceItem, JournalEntry
 from .forms import JournalEntryForm, JournalEntryLineFormSet
 from accounts.forms import JournalEntryLine
@@ -14,7 +21,8 @@ from .models import Account
 from django.contrib.auth.decorators import permission_required
 from accounts.decorators import role_required
 from django.utils import timezone
-from .models import AccountingPeriod
+from .models import AccountingPeriod, BackgroundJob
+from . import exports, imports, jobs, metrics, periods, services, statements
 
 
 
@@ -22,18 +30,12 @@ from .models import AccountingPeriod
 from .forms import (
    JournalEntryForm,
     InvoiceForm,
-    InvoiceItemFormSet
+    InvoiceItemFormSet,
+    ImportForm
 )
 
-#  Decorator للتحقق من الدور
-def role_required(*roles):
-    def decorator(view_func):
-        def wrapper(request, *args, **kwargs):
-            if request.user.role not in roles:
-                return HttpResponseForbidden("غير مصرح لك بالدخول إلى هذه الصفحة")
-            return view_func(request, *args, **kwargs)
-        return wrapper
-    return decorator
+ENTRIES_PER_PAGE = 25
+JOBS_PER_PAGE = 50
 
 
 #  تسجيل الدخول
@@ -85,35 +87,57 @@ def admin_dashboard(request):
 @login_required
 @role_required('manager')
 def manager_dashboard(request):
+    months = 24 if request.GET.get('months') == '24' else 12
 
-    income = (
-        JournalEntryLine.objects
-        .filter(
-            account__account_type='revenue',
-            journal_entry__status='approved'
-        )
-        .aggregate(total=Sum('credit'))['total'] or 0
-    )
+    context = services.cached_profit_and_loss()
+    context['months'] = months
+    context['trend'] = services.monthly_profit_and_loss(months)
+
+    return render(request, 'dashboard/manager.html', context)
+
+def _post_journal_entry(request, form, formset):
+    if not form.is_valid():
+        messages.error(request, '❌ يوجد خطأ في بيانات القيد')
+        return False
+
+    if not formset.is_valid():
+        messages.error(request, '❌ يوجد خطأ في أسطر القيد')
+        return False
 
-    expense = (
-        JournalEntryLine.objects
-        .filter(
-            account__account_type='expense',
-            journal_entry__status='approved'
+    entry = form.save(commit=False)
+    entry.created_by = request.user
+    entry.status = 'draft'
+
+    try:
+        services.post_journal_entries([(entry, formset.save(commit=False))])
+    except ValidationError as e:
+        for message in e.messages:
+            messages.error(request, f"❌ {message}")
+        return False
+
+    return True
+
+
+def _entries_page(request, status=None):
+    entries = (
+        JournalEntry.objects
+        .select_related('created_by')
+        .prefetch_related(
+            Prefetch(
+                'lines',
+                queryset=JournalEntryLine.objects.select_related('account').order_by('id')
+            )
         )
-        .aggregate(total=Sum('debit'))['total'] or 0
+        .order_by('-created_at', '-id')
     )
 
+    if status in ('approved', 'draft'):
+        entries = entries.filter(status=status)
+    elif status == 'unbalanced':
+        entries = entries.filter(is_balanced=False)
 
-    profit = income - expense
-
-    context = {
-        'income': income,
-        'expense': expense,
-        'profit': profit,
-    }
+    return Paginator(entries, ENTRIES_PER_PAGE).get_page(request.GET.get('page'))
 
-    return render(request, 'dashboard/manager.html', context)
 
 #لوحة المحاسب
 @login_required
@@ -124,68 +148,22 @@ def accountant_dashboard(request):
         form = JournalEntryForm(request.POST)
         formset = JournalEntryLineFormSet(request.POST)
 
-        if form.is_valid():
-            #  حفظ رأس القيد 
-            entry = form.save(commit=False)
-            entry.created_by = request.user
-            entry.status = 'draft'
-            entry.save()
-
-            formset = JournalEntryLineFormSet(request.POST, instance=entry)
-
-            if formset.is_valid():
-                formset.save()
-
-                #  التحقق من توازن القيد
-                total_debit = entry.lines.aggregate(
-                    total=Sum('debit')
-                )['total'] or 0
-
-                total_credit = entry.lines.aggregate(
-                    total=Sum('credit')
-                )['total'] or 0
-
-                if total_debit != total_credit:
-                    entry.delete()
-                    messages.error(
-                        request,
-                        f"❌ القيد غير متوازن: مدين {total_debit} ≠ دائن {total_credit}"
-                    )
-                    return redirect('accountant_dashboard')
-
-                #  نجاح حفظ القيد 
-                messages.success(request, '✅ تم حفظ القيد المحاسبي بنجاح')
-                return redirect('accountant_dashboard')
-
-            else:
-                entry.delete()
-                messages.error(request, '❌ يوجد خطأ في أسطر القيد')
-
-        else:
-            messages.error(request, '❌ يوجد خطأ في بيانات القيد')
+        if _post_journal_entry(request, form, formset):
+            messages.success(request, '✅ تم حفظ القيد المحاسبي بنجاح')
+            return redirect('accountant_dashboard')
 
     else:
         form = JournalEntryForm()
         formset = JournalEntryLineFormSet()
         
     status = request.GET.get('status')
-
-    entries = (
-        JournalEntry.objects
-        .select_related('created_by')
-        .prefetch_related('lines')
-        .order_by('-created_at')
-    )
-
-    if status == 'approved':
-        entries = entries.filter(status='approved')
-    elif status == 'draft':
-        entries = entries.filter(status='draft')
+    page = _entries_page(request, status)
 
     return render(request, 'dashboard/accountant.html', {
         'form': form,
         'formset': formset,
-        'entries': entries,
+        'entries': page.object_list,
+        'page': page,
         'status': status
     })
 
@@ -197,66 +175,26 @@ def data_entry_dashboard(request):
 
     if request.method == 'POST':
         form = JournalEntryForm(request.POST)
+        formset = JournalEntryLineFormSet(request.POST)
 
-        if form.is_valid():
-         
-            entry = form.save(commit=False)
-            entry.created_by = request.user
-            entry.status = 'draft'
-            entry.save() 
-
-            formset = JournalEntryLineFormSet(request.POST, instance=entry)
-
-            if formset.is_valid():
-                formset.save()
-
-        
-                total_debit = entry.lines.aggregate(
-                    total=Sum('debit')
-                )['total'] or 0
-
-                total_credit = entry.lines.aggregate(
-                    total=Sum('credit')
-                )['total'] or 0
-
-                if total_debit != total_credit:
-                    entry.delete()
-                    messages.error(
-                        request,
-                        f"❌ القيد غير متوازن: مدين {total_debit} ≠ دائن {total_credit}"
-                    )
-                    return redirect('data_entry_dashboard')
-
-              
-                messages.success(
-                    request,
-                    '✅ تم حفظ القيد وإرساله للمحاسب للمراجعة'
-                )
-                return redirect('data_entry_dashboard')
-
-            else:
-                entry.delete()
-                messages.error(request, '❌ يوجد خطأ في أسطر القيد')
-
-        else:
-            messages.error(request, '❌ يوجد خطأ في بيانات القيد')
+        if _post_journal_entry(request, form, formset):
+            messages.success(
+                request,
+                '✅ تم حفظ القيد وإرساله للمحاسب للمراجعة'
+            )
+            return redirect('data_entry_dashboard')
 
     else:
         form = JournalEntryForm()
         formset = JournalEntryLineFormSet()
 
-    entries = (
-    JournalEntry.objects
-    .select_related('created_by')
-    .prefetch_related('lines')
-    .order_by('-created_at')
-)
-
+    page = _entries_page(request)
 
     return render(request, 'dashboard/data_entry.html', {
         'form': form,
         'formset': formset,
-        'entries': entries
+        'entries': page.object_list,
+        'page': page,
     })
 
 
@@ -273,7 +211,7 @@ def create_invoice(request):
 
         if invoice_form.is_valid():
             invoice = invoice_form.save(commit=False)
-            if invoice.period and invoice.period.is_closed:
+            if periods.is_closed(invoice.period_id):
                 invoice_form.add_error(
                     'period',
                     '❌ لا يمكن إنشاء فاتورة في فترة محاسبية مقفلة'
@@ -289,14 +227,10 @@ def create_invoice(request):
                     if formset.is_valid():
                         items = formset.save(commit=False)
 
-                        total = 0
+                        # كل بند يضيف قيمته إلى إجمالي الفاتورة عند حفظه
                         for item in items:
                             item.invoice = invoice
                             item.save()
-                            total += item.total_price
-
-                        invoice.total_amount = total
-                        invoice.save(update_fields=['total_amount'])
 
                         messages.success(request, "✅ تم حفظ الفاتورة بنجاح")
 
@@ -321,21 +255,30 @@ def create_invoice(request):
 @login_required
 @role_required('accountant')
 def accountant_invoices(request):
-    status = request.GET.get('status')
-
-    invoices = Invoice.objects.all().order_by('-created_at')
-
-    if status == 'approved':
-        invoices = invoices.filter(is_approved=True)
-    elif status == 'pending':
-        invoices = invoices.filter(is_approved=False)
+    filters = _invoice_filters(request)
+    page = services.invoice_page(
+        services.filter_invoices(**filters),
+        cursor=request.GET.get('cursor')
+    )
 
     return render(request, 'invoices/accountant_invoices.html', {
-        'invoices': invoices,
-        'status': status
+        **page,
+        **filters,
+        'status': filters.get('status'),
+        'filters': urlencode(filters),
+        'invoice_types': Invoice.INVOICE_TYPES,
+        'periods': periods.all_periods()[::-1],
     })
 
 
+def _invoice_filters(request):
+    return {
+        key: request.GET[key].strip()
+        for key in services.INVOICE_FILTERS
+        if request.GET.get(key, '').strip()
+    }
+
+
 #  تفاصيل الفاتورة
 @login_required
 @role_required('accountant')
@@ -357,86 +300,62 @@ def approve_invoice(request, invoice_id):
 
     if invoice.is_approved:
         return redirect('invoice_detail', invoice.id)
-    if invoice.period and invoice.period.is_closed:
-        messages.error(
-            request,
-              "❌ لا يمكن اعتماد فاتورة في فترة محاسبية مقفلة"
-        )
-        return redirect('invoice_detail', invoice.id)
 
-    if invoice.is_approved:
+    try:
+        approved, skipped = services.approve_invoices([invoice], request.user)
+    except ValidationError as e:
+        messages.error(request, f"❌ {' '.join(e.messages)}")
         return redirect('invoice_detail', invoice.id)
 
-    amount = invoice.total_amount
+    for _, reason in skipped:
+        messages.error(request, f"❌ {reason}")
 
-    with transaction.atomic():
+    if approved:
+        messages.success(request, "✅ تم اعتماد الفاتورة وإنشاء القيد المحاسبي بنجاح")
+    return redirect('invoice_detail', invoice.id)
 
-        #  إنشاء رأس القيد
-        entry = JournalEntry.objects.create(
-            date=invoice.invoice_date,
-            description=f"قيد تلقائي للفاتورة {invoice.invoice_number}",
-            created_by=request.user,
-            status='approved',
-            invoice=invoice,
-            period=invoice.period
-        )
 
-        #  جلب الحسابات
-        if invoice.invoice_type == 'sale':
-            debit_account = Account.objects.filter(account_type='asset').first()
-            credit_account = Account.objects.filter(account_type='revenue').first()
-        else:
-            debit_account = Account.objects.filter(account_type='expense').first()
-            credit_account = Account.objects.filter(account_type='liability').first()
-
-        #  تأكد أن الحسابات موجودة
-        if not debit_account or not credit_account:
-            raise ValueError("الحسابات المحاسبية غير مكتملة")
-
-        #  سطر مدين
-        JournalEntryLine.objects.create(
-            journal_entry=entry,
-            account=debit_account,
-            debit=amount,
-            credit=Decimal('0')
-        )
+#  اعتماد مجموعة فواتير
+@login_required
+@role_required('accountant')
+def approve_invoices(request):
+    if request.method != 'POST':
+        return redirect('accountant_invoices')
 
-        #  سطر دائن
-        JournalEntryLine.objects.create(
-            journal_entry=entry,
-            account=credit_account,
-            debit=Decimal('0'),
-            credit=amount
-        )
+    invoices = Invoice.objects.filter(
+        id__in=[pk for pk in request.POST.getlist('invoice_ids') if pk.isdigit()]
+    )
 
-        # اعتماد الفاتورة
-        invoice.is_approved = True
-        invoice.save(update_fields=['is_approved'])
+    try:
+        approved, skipped = services.approve_invoices(invoices, request.user)
+    except ValidationError as e:
+        messages.error(request, f"❌ {' '.join(e.messages)}")
+        return redirect('accountant_invoices')
 
-    messages.success(request, "✅ تم اعتماد الفاتورة وإنشاء القيد المحاسبي بنجاح")
-    return redirect('invoice_detail', invoice.id)
+    for invoice, reason in skipped:
+        messages.error(request, f"❌ {invoice.invoice_number}: {reason}")
+
+    if approved:
+        messages.success(
+            request,
+            f"✅ تم اعتماد {len(approved)} فاتورة وإنشاء قيودها المحاسبية"
+        )
+    return redirect('accountant_invoices')
 
 @login_required
 @role_required('accountant')
 def approve_journal_entry(request, entry_id):
     entry = get_object_or_404(JournalEntry, id=entry_id)
 
-    if entry.status == 'approved':
-        return redirect('accountant_dashboard')
-
-    # منع اعتماد قيد في فترة مقفلة
-    if entry.period and entry.period.is_closed:
-        messages.error(
-            request,
-            "❌ لا يمكن اعتماد قيد في فترة محاسبية مقفلة"
-        )
+    try:
+        approved = services.approve_journal_entry(entry)
+    except ValidationError as e:
+        messages.error(request, f"❌ {' '.join(e.messages)}")
         return redirect('accountant_dashboard')
 
-    entry.status = 'approved'
-    entry.posted = True
-    entry.save(update_fields=['status', 'posted'])
-
-    messages.success(request, "✅ تم اعتماد القيد المحاسبي بنجاح")
+    # القيد المعتمد مسبقاً لا يُرحّل مرة ثانية
+    if approved:
+        messages.success(request, "✅ تم اعتماد القيد المحاسبي بنجاح")
     return redirect('accountant_dashboard')
 
 
@@ -448,31 +367,39 @@ def approve_journal_entry(request, entry_id):
 @permission_required('accounts.access_general_ledger', raise_exception=True)
 def general_ledger(request):
     account_id = request.GET.get('account')
+    date_from = services.safe_date(request.GET.get('date_from'))
+    date_to = services.safe_date(request.GET.get('date_to'))
 
     account = None
-    lines = []
-    running_balance = 0
+    ledger = {}
+    filters = ''
 
     if account_id:
-        account = Account.objects.get(id=account_id)
-
-        lines = (
-            JournalEntryLine.objects
-            .filter(account=account)
-            .select_related('journal_entry')
-            .order_by('journal_entry__date', 'id')
+        account = get_object_or_404(Account, id=account_id)
+        ledger = services.general_ledger(
+            account,
+            date_from,
+            date_to,
+            cursor=request.GET.get('cursor')
         )
 
-        for line in lines:
-            running_balance += line.debit - line.credit
-            line.running_balance = running_balance
-
-    accounts = Account.objects.all()
+        filters = urlencode({
+            key: value
+            for key, value in (
+                ('account', account.id),
+                ('date_from', date_from or ''),
+                ('date_to', date_to or ''),
+            )
+            if value
+        })
 
     return render(request, 'accounts/general_ledger.html', {
-        'accounts': accounts,
+        'accounts': services.chart_of_accounts().values(),
         'selected_account': account,
-        'lines': lines,
+        'date_from': date_from,
+        'date_to': date_to,
+        'filters': filters,
+        **ledger,
     })
 
 
@@ -481,52 +408,283 @@ def general_ledger(request):
 @login_required
 @permission_required('accounts.view_trial_balance', raise_exception=True)
 def trial_balance(request):
-    rows = []
-    total_debit = 0
-    total_credit = 0
-
-    accounts = Account.objects.all()
-
-    for account in accounts:
-        debit = account.journalentryline_set.aggregate(
-            total=Sum('debit')
-        )['total'] or 0
-
-        credit = account.journalentryline_set.aggregate(
-            total=Sum('credit')
-        )['total'] or 0
-
-        if debit != 0 or credit != 0:
-            rows.append({
-                'account': account,
-                'debit': debit,
-                'credit': credit
-            })
-            total_debit += debit
-            total_credit += credit
-
-    context = {
-        'rows': rows,
-        'total_debit': total_debit,
-        'total_credit': total_credit,
-    }
+    context = services.trial_balance()
 
     return render(request, 'accounts/trial_balance.html', context)
 
 
+def _selected_period(request):
+    # الفترة من الفهرس المخزن بدلاً من استعلام في كل تقرير
+    period_id = request.GET.get('period') or ''
+    if not period_id:
+        return None
+
+    period = periods.get_period(int(period_id)) if period_id.isdigit() else None
+    if period is None:
+        raise Http404("الفترة غير موجودة")
+    return period
+
+
+#ميزان المراجعة لفترة
+@login_required
+@permission_required('accounts.view_trial_balance', raise_exception=True)
+def period_trial_balance(request):
+    options = periods.all_periods()[::-1]
+    period = _selected_period(request) or (options[0] if options else None)
+
+    context = services.period_trial_balance(period) if period else {'rows': [], 'totals': {}}
+    context.update({
+        'periods': options,
+        'period': period,
+    })
+
+    return render(request, 'accounts/period_trial_balance.html', context)
+
+
+#ميزان المراجعة الموحد
+@login_required
+@permission_required('accounts.view_trial_balance', raise_exception=True)
+def consolidated_trial_balance(request):
+    context = services.consolidated_trial_balance()
+
+    return render(request, 'accounts/consolidated_trial_balance.html', context)
+
+
+def _compare_periods(request):
+    return list(
+        AccountingPeriod.objects
+        .filter(id__in=[pk for pk in request.GET.getlist('compare') if pk.isdigit()])
+        .order_by('-end_date')
+    )
+
+
+#الميزانية العمومية
+@login_required
+@permission_required('accounts.view_trial_balance', raise_exception=True)
+def balance_sheet(request):
+    period = _selected_period(request)
+
+    as_of = period.end_date if period else (
+        services.safe_date(request.GET.get('as_of')) or timezone.localdate()
+    )
+    compare = _compare_periods(request)
+
+    context = statements.balance_sheet([as_of] + [p.end_date for p in compare])
+    context.update({
+        'periods': periods.all_periods(),
+        'selected_period': period,
+        'as_of': as_of,
+        'compare': compare,
+    })
+
+    return render(request, 'accounts/balance_sheet.html', context)
+
+
+#قائمة الدخل
+@login_required
+@permission_required('accounts.view_trial_balance', raise_exception=True)
+def income_statement(request):
+    period = _selected_period(request)
+
+    if period:
+        date_from, date_to = period.start_date, period.end_date
+    else:
+        date_to = services.safe_date(request.GET.get('date_to')) or timezone.localdate()
+        date_from = services.safe_date(request.GET.get('date_from')) or date_to.replace(month=1, day=1)
+
+    compare = _compare_periods(request)
+
+    context = statements.income_statement(
+        [(date_from, date_to)] + [(p.start_date, p.end_date) for p in compare]
+    )
+    context.update({
+        'periods': periods.all_periods(),
+        'selected_period': period,
+        'date_from': date_from,
+        'date_to': date_to,
+        'compare': compare,
+    })
+
+    return render(request, 'accounts/income_statement.html', context)
+
+
+#التصدير
+@login_required
+@permission_required('accounts.access_general_ledger', raise_exception=True)
+def export_general_ledger(request):
+    account = get_object_or_404(Account, id=request.GET.get('account'))
+    date_from = services.safe_date(request.GET.get('date_from'))
+    date_to = services.safe_date(request.GET.get('date_to'))
+
+    if request.GET.get('background'):
+        return _enqueue_job(
+            request,
+            'export_general_ledger',
+            account_id=account.id,
+            date_from=date_from.isoformat() if date_from else None,
+            date_to=date_to.isoformat() if date_to else None,
+            export_format=request.GET.get('format')
+        )
+
+    return exports.export_response(
+        request.GET.get('format'),
+        exports.LEDGER_HEADER,
+        exports.ledger_rows(account, date_from, date_to),
+        f"general_ledger_{account.code}"
+    )
+
+
+@login_required
+@permission_required('accounts.view_trial_balance', raise_exception=True)
+def export_trial_balance(request):
+    if request.GET.get('background'):
+        return _enqueue_job(request, 'export_trial_balance', export_format=request.GET.get('format'))
+
+    return exports.export_response(
+        request.GET.get('format'),
+        exports.TRIAL_BALANCE_HEADER,
+        exports.trial_balance_rows(),
+        "trial_balance"
+    )
+
+
+@login_required
+@role_required('accountant')
+def export_invoices(request):
+    filters = _invoice_filters(request)
+
+    if request.GET.get('background'):
+        return _enqueue_job(
+            request,
+            'export_invoices',
+            filters=filters,
+            export_format=request.GET.get('format')
+        )
+
+    return exports.export_response(
+        request.GET.get('format'),
+        exports.INVOICES_HEADER,
+        exports.invoice_rows(services.filter_invoices(**filters)),
+        "invoices"
+    )
+
+
+# =========================
+# الاستيراد
+# =========================
+@login_required
+@role_required('accountant')
+def import_ledger(request):
+    form = ImportForm(request.POST or None, request.FILES or None)
+
+    if request.method == 'POST' and form.is_valid():
+        upload = form.cleaned_data['file']
+        # الملف يُحفظ ويُقرأ في العامل الخلفي حتى لا يتجاوز الطلب مهلة الخادم
+        path = default_storage.save(f"imports/{upload.name}", upload)
+
+        return _enqueue_job(
+            request,
+            'import_ledger',
+            path=path,
+            kind=form.cleaned_data['kind'],
+            file_format=imports.detect_format(upload.name),
+            approve=form.cleaned_data['approve']
+        )
+
+    return render(request, 'accounts/import_ledger.html', {
+        'form': form,
+        'entry_columns': imports.ENTRY_COLUMNS,
+        'invoice_columns': imports.INVOICE_COLUMNS,
+    })
+
+
+# =========================
+# المهام الخلفية
+# =========================
+def _enqueue_job(request, name, **params):
+    job = jobs.enqueue(name, request.user, **params)
+    messages.info(request, f"تمت جدولة المهمة: {jobs.job_label(name)}")
+    return redirect('job_detail', job_id=job.id)
+
+
+@login_required
+def job_list(request):
+    user_jobs = (
+        BackgroundJob.objects
+        .filter(created_by=request.user)
+        .order_by('-created_at')[:JOBS_PER_PAGE]
+    )
+
+    return render(request, 'jobs/job_list.html', {
+        'jobs': [(job, jobs.job_label(job.name)) for job in user_jobs],
+    })
+
+
+@login_required
+def job_detail(request, job_id):
+    job = get_object_or_404(BackgroundJob, id=job_id, created_by=request.user)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.id,
+            'status': job.status,
+            'progress': job.progress,
+            'message': job.message,
+            'download_url': reverse('download_job_result', args=[job.id]) if job.result else None,
+        })
+
+    return render(request, 'jobs/job_detail.html', {
+        'job': job,
+        'label': jobs.job_label(job.name),
+    })
+
+
+@login_required
+def download_job_result(request, job_id):
+    job = get_object_or_404(BackgroundJob, id=job_id, created_by=request.user)
+    if not job.result:
+        raise Http404("لا يوجد ملف نتيجة لهذه المهمة")
+
+    return FileResponse(
+        job.result.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.result.name)
+    )
+
+
+
+
+# مؤشرات الأداء بصيغة Prometheus
+def metrics_endpoint(request):
+    token = settings.METRICS_TOKEN
+    authorized = (
+        (token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"))
+        or (request.user.is_authenticated and request.user.is_staff)
+    )
+    if not authorized:
+        return HttpResponseForbidden("غير مصرح لك بالدخول إلى هذه الصفحة")
+
+    return HttpResponse(
+        metrics.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
 
 
 #الإقفال المحاسبي
+@login_required
 @permission_required('accounts.close_accounting_period', raise_exception=True)
 def close_accounting_period(request, period_id):
     period = get_object_or_404(AccountingPeriod, id=period_id)
 
-    period.is_closed = True
-    period.closed_at = timezone.now()
-    period.closed_by = request.user
-    period.save()
+    if request.method != 'POST':
+        return redirect('admin:accounts_accountingperiod_changelist')
+
+    if period.is_closed:
+        messages.error(request, "الفترة مقفلة مسبقاً")
+        return redirect('admin:accounts_accountingperiod_changelist')
 
-    return redirect('accounting_period_list')
+    # الإقفال يمسح الدفتر كاملاً، فيُنفّذ في عامل خلفي بدلاً من طلب الويب
+    return _enqueue_job(request, 'close_period', period_id=period.id)
 
 #  تسجيل الخروج
 @login_required
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'accounts.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,6 +95,34 @@ DATABASES = {
 }
 
 
+# Cache
+# ملفات مشتركة بين عمليات الخادم حتى يصل الإبطال إلى كل العمليات
+
+# الحد الافتراضي 300 ملف، وبعده يحذف FileBasedCache ثلث المدخلات عشوائياً
+# والجلسات في ذاكرة مستقلة حتى لا تزاحم المستخدمين والصلاحيات والفهارس
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/tmp/smart_finance_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/tmp/smart_finance_sessions',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+
+# Authentication
+# المستخدم وصلاحياته والجلسة من الذاكرة المؤقتة، وقاعدة البيانات عند غيابها فقط
+
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -132,4 +161,25 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
-STATIC_ROOT = BASE_DIR / "staticfiles"   
\ No newline at end of file
+STATIC_ROOT = BASE_DIR / "staticfiles"   
+
+# ميزان المراجعة من جدول الأرصدة المجمعة بدلاً من أسطر القيود
+ACCOUNTS_MATERIALIZED_BALANCES = True
+
+# حساب الأرباح المبقاة الذي يُرحّل إليه صافي الفترة عند الإقفال
+# (إن لم يُحدد يُستخدم أول حساب حقوق ملكية حسب الرمز)
+RETAINED_EARNINGS_ACCOUNT_CODE = None
+
+# ملفات نتائج المهام الخلفية (تُنزّل عبر عرض محمي وليس مباشرة)
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# مدة انتظار العامل بالثواني عند عدم وجود مهام
+BACKGROUND_JOBS_POLL_INTERVAL = 2
+
+# المهمة قيد التنفيذ التي لم يُحدّث عاملها نبضته خلال هذه المدة بالثواني
+# تُعلّم فاشلة، لأن عاملها توقف قبل إنهائها
+BACKGROUND_JOBS_STALE_AFTER = 5 * 60
+
+# رمز يرسله Prometheus في ترويسة Authorization: Bearer <token> لقراءة /metrics/
+# (المستخدمون الإداريون يمكنهم عرضها بعد تسجيل الدخول)
+METRICS_TOKEN = None